@@ -0,0 +1,404 @@
+import random
+import numpy as np
+from epidemics_sim.agents.base_agent import (
+    State, SEVERITIES, STATES_BY_VALUE, INFECTION_STATUS_FIELDS, MASK_FIELDS, FieldMapping, notify_transition
+)
+from epidemics_sim.agents.human_agent import GENDERS, OCCUPATIONS
+
+# Column name -> dtype. Every column is indexed by agent id.
+COLUMNS = {
+    "age": np.uint8,
+    "gender": np.int8,              # index into GENDERS
+    "occupation": np.int8,          # index into OCCUPATIONS
+    "municipio": np.int16,          # index into AgentStore.municipios
+    "household_id": np.int32,       # -1 = not assigned
+    "mortality_rate": np.float32,
+    "weight": np.float32,           # real people represented by the agent (scaled-down samples)
+    "state": np.int8,               # State.value
+    "severity": np.int8,            # index into SEVERITIES
+    "disease": np.int8,             # index into AgentStore.diseases
+    "days_infected": np.int16,
+    "incubation_period": np.int16,
+    "immunity_days": np.int16,
+    "contagious": np.bool_,
+    "asymptomatic": np.bool_,
+    "immune": np.bool_,
+    "vaccinated": np.bool_,
+    "vaccine_effectiveness": np.float32,
+    "mask_usage": np.bool_,
+    "mask_factor": np.float32,
+    "is_isolated": np.bool_,
+    "is_hospitalized": np.bool_,
+    "isolation_days": np.int16,
+}
+
+
+class AgentStore:
+    def __init__(self, size, municipios=(), comorbidity_names=(), record_history=False, columns=None, first_id=0):
+        """
+        Struct-of-arrays population: one typed NumPy column per agent attribute.
+
+        Behaves like the ``dict[int, HumanAgent]`` used elsewhere (``store[agent_id]``,
+        ``keys()``, ``values()``, ``items()``), handing out lightweight AgentView objects
+        so DiseaseModel, the policies and HealthcareSystem keep working unchanged, while
+        vectorized code can operate on the columns directly (``store.state``, ``store.age``...).
+
+        :param size: Number of agents. Agent ids are first_id..first_id+size-1.
+        :param municipios: Names of the municipalities (index = municipio code).
+        :param comorbidity_names: Names of the comorbidity columns.
+        :param record_history: Keep a transition history per agent (off by default).
+        :param columns: Existing arrays to use instead of fresh ones (e.g. memory-mapped
+                        columns of a population snapshot), keyed like COLUMNS plus "comorbidities".
+        :param first_id: Id of the agent in row 0 (non-zero for the shards of a larger population).
+        """
+        self.size = size
+        self.first_id = first_id
+        self.municipios = list(municipios)
+        self.comorbidity_names = list(comorbidity_names)
+        self.diseases = [""]
+        if columns is None:
+            for name, dtype in COLUMNS.items():
+                setattr(self, name, np.zeros(size, dtype=dtype))
+            self.comorbidities = np.zeros((size, len(self.comorbidity_names)), dtype=np.bool_)
+            self.household_id[:] = -1
+            self.state[:] = State.SUSCEPTIBLE.value
+            self.mask_factor[:] = 1.0
+            self.weight[:] = 1.0
+            self.vaccine_effectiveness[:] = np.nan
+        else:
+            for name in list(COLUMNS) + ["comorbidities"]:
+                setattr(self, name, columns[name])
+        self.history = {} if record_history else None
+        self._households = None
+        # Multiplicadores de transmisión precalculados (ver update_multipliers)
+        self.susceptibility = np.ones(size, dtype=np.float32)
+        self.infectivity = np.ones(size, dtype=np.float32)
+        self.update_multipliers()
+
+    @classmethod
+    def from_arrays(cls, columns, record_history=False):
+        """
+        Build a store from the columns of SyntheticPopulationGenerator.generate_population_arrays.
+        """
+        first_id = int(columns["agent_id"][0]) if len(columns["age"]) else 0
+        store = cls(len(columns["age"]), columns["municipios"], columns["comorbidity_names"], record_history,
+                    first_id=first_id)
+        store.age[:] = columns["age"]
+        store.gender[:] = columns["gender"]
+        store.occupation[:] = columns["occupation"]
+        store.municipio[:] = columns["municipio"]
+        store.mortality_rate[:] = columns["mortality_rate"]
+        store.weight[:] = columns.get("weight", 1.0)
+        store.comorbidities[:] = columns["comorbidities"]
+        return store
+
+    @classmethod
+    def from_agents(cls, agents, record_history=False):
+        """
+        Build a store from a ``dict[int, HumanAgent]`` with contiguous ids.
+        """
+        municipios = list(dict.fromkeys(agent.municipio for agent in agents.values()))
+        names = list(next(iter(agents.values())).comorbidities) if agents else []
+        store = cls(len(agents), municipios, names, record_history, first_id=min(agents, default=0))
+        for agent_id, agent in agents.items():
+            view = store[agent_id]
+            for attribute in ("age", "gender", "occupation", "municipio", "household_id", "mortality_rate", "weight",
+                              "incubation_period", "immune", "vaccinated", "vaccine_effectiveness",
+                              "is_isolated", "is_hospitalized"):
+                setattr(view, attribute, getattr(agent, attribute))
+            view.comorbidities = agent.comorbidities
+            view.infection_status = agent.infection_status
+            view.mask = agent.mask
+        return store
+
+    def update_multipliers(self, rows=slice(None)):
+        """
+        Recompute the cached transmission multipliers of ``rows`` from the vaccine and mask columns.
+
+        ``infectivity`` scales what an agent transmits (its mask) and ``susceptibility`` what
+        it receives (its mask and vaccine), so the probability of a contact is
+        ``transmission_rate * infectivity[source] * susceptibility[target]``. Interventions
+        change the columns in bulk (set_masks, vaccinate) and the multipliers follow;
+        AgentView setters of those columns update their row.
+
+        :param rows: Rows to update (index array, slice or single row); all by default.
+        """
+        mask = np.where(self.mask_usage[rows], self.mask_factor[rows], 1.0)
+        effectiveness = np.nan_to_num(self.vaccine_effectiveness[rows], nan=0.0)
+        self.infectivity[rows] = mask
+        self.susceptibility[rows] = mask * np.where(self.vaccinated[rows], 1 - effectiveness, 1.0)
+
+    def set_masks(self, rows, usage, reduction_factor):
+        """
+        Put on (or take off) masks for ``rows`` at once, e.g. MaskUsagePolicy.
+
+        :param rows: Rows (index array or slice).
+        :param usage: Whether the agents wear a mask.
+        :param reduction_factor: Factor applied to the transmission probability when worn.
+        """
+        self.mask_usage[rows] = usage
+        self.mask_factor[rows] = reduction_factor
+        self.update_multipliers(rows)
+
+    def vaccinate(self, rows, effectiveness):
+        """
+        Vaccinate ``rows`` at once, e.g. VaccinationPolicy.
+
+        :param rows: Rows (index array or slice).
+        :param effectiveness: Reduction of the probability of being infected (0 to 1).
+        """
+        self.vaccinated[rows] = True
+        self.vaccine_effectiveness[rows] = effectiveness
+        self.update_multipliers(rows)
+
+    def encode_disease(self, name):
+        """
+        Return the code of a disease name, registering it on first use.
+        """
+        if name not in self.diseases:
+            self.diseases.append(name)
+        return self.diseases.index(name)
+
+    def households(self):
+        """
+        Household membership as (offsets, members): the ids of household h are
+        ``members[offsets[h]:offsets[h + 1]]``.
+        """
+        if self._households is None:
+            self._households = self._build_households()
+        return self._households
+
+    def household_members(self, household_id):
+        """
+        Ids of the agents that share ``household_id``.
+        """
+        offsets, members = self.households()
+        if household_id is None or not 0 <= household_id < len(offsets) - 1:
+            return members[:0]
+        return members[offsets[household_id]:offsets[household_id + 1]]
+
+    def _build_households(self):
+        assigned = np.flatnonzero(self.household_id >= 0)
+        order = assigned[np.argsort(self.household_id[assigned], kind="stable")]
+        sizes = np.bincount(self.household_id[assigned]) if len(assigned) else np.zeros(0, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        return offsets, order + self.first_id
+
+    def set_households(self, offsets, members):
+        """
+        Register household membership as offset/index arrays and update household_id.
+
+        :param offsets: Array of length num_households + 1.
+        :param members: Agent ids grouped by household.
+        """
+        self._households = (np.asarray(offsets), np.asarray(members))
+        self.household_id[np.asarray(members) - self.first_id] = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+    def invalidate_households(self):
+        self._households = None
+
+    def count(self, state):
+        """
+        Number of agents in the given State.
+        """
+        return int(np.count_nonzero(self.state == state.value))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, agent_id):
+        if agent_id not in self:
+            raise KeyError(agent_id)
+        return AgentView(self, agent_id)
+
+    def __contains__(self, agent_id):
+        return self.first_id <= agent_id < self.first_id + self.size
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return range(self.first_id, self.first_id + self.size)
+
+    def values(self):
+        return _AgentValues(self)
+
+    def items(self):
+        return ((agent_id, AgentView(self, agent_id)) for agent_id in self.keys())
+
+    def nbytes(self):
+        return (sum(getattr(self, name).nbytes for name in COLUMNS) + self.comorbidities.nbytes
+                + self.susceptibility.nbytes + self.infectivity.nbytes)
+
+
+def store_of(agents):
+    """
+    The AgentStore behind ``agents`` (the store itself or its ``values()``), or None for
+    plain collections of agents. Lets the policies update the columns in bulk.
+    """
+    if isinstance(agents, AgentStore):
+        return agents
+    if isinstance(agents, _AgentValues):
+        return agents._store
+    return None
+
+
+class _AgentValues:
+    """
+    Re-iterable sequence of AgentView, like ``dict.values()``.
+    """
+    __slots__ = ("_store",)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __iter__(self):
+        store = self._store
+        return (AgentView(store, agent_id) for agent_id in store.keys())
+
+
+def _column_property(name, decode=None, encode=None, multiplier=False):
+    def fget(self):
+        value = getattr(self._store, name)[self._row].item()
+        return decode(self._store, value) if decode else value
+
+    def fset(self, value):
+        getattr(self._store, name)[self._row] = encode(self._store, value) if encode else value
+        if multiplier:
+            self._store.update_multipliers(self._row)
+
+    return property(fget, fset)
+
+
+class AgentView:
+    __slots__ = ("_store", "_row", "agent_id")
+
+    def __init__(self, store, agent_id):
+        """
+        Lightweight handle on one row of an AgentStore that mimics the HumanAgent interface.
+
+        :param store: The AgentStore that owns the data.
+        :param agent_id: Id of the agent.
+        """
+        self._store = store
+        self._row = agent_id - store.first_id
+        self.agent_id = agent_id
+
+    age = _column_property("age")
+    gender = _column_property("gender", lambda s, v: GENDERS[v], lambda s, v: GENDERS.index(v))
+    occupation = _column_property("occupation", lambda s, v: OCCUPATIONS[v], lambda s, v: OCCUPATIONS.index(v))
+    municipio = _column_property("municipio", lambda s, v: s.municipios[v], lambda s, v: s.municipios.index(v))
+    mortality_rate = _column_property("mortality_rate")
+    weight = _column_property("weight")
+    state = _column_property("state", lambda s, v: STATES_BY_VALUE[v], lambda s, v: v.value)
+    severity = _column_property("severity", lambda s, v: SEVERITIES[v], lambda s, v: SEVERITIES.index(v))
+    disease = _column_property("disease", lambda s, v: s.diseases[v], lambda s, v: s.encode_disease(v))
+    days_infected = _column_property("days_infected")
+    incubation_period = _column_property("incubation_period")
+    immunity_days = _column_property("immunity_days")
+    contagious = _column_property("contagious", encode=lambda s, v: bool(v))
+    asymptomatic = _column_property("asymptomatic", encode=lambda s, v: bool(v))
+    immune = _column_property("immune")
+    vaccinated = _column_property("vaccinated", multiplier=True)
+    vaccine_effectiveness = _column_property("vaccine_effectiveness", lambda s, v: None if v != v else v,
+                                             lambda s, v: np.nan if v is None else v, multiplier=True)
+    mask_usage = _column_property("mask_usage", multiplier=True)
+    mask_factor = _column_property("mask_factor", multiplier=True)
+    susceptibility = _column_property("susceptibility")
+    infectivity = _column_property("infectivity")
+    is_isolated = _column_property("is_isolated")
+    is_hospitalized = _column_property("is_hospitalized")
+    isolation_days = _column_property("isolation_days")
+
+    @property
+    def infection_status(self):
+        return FieldMapping(self, INFECTION_STATUS_FIELDS)
+
+    @infection_status.setter
+    def infection_status(self, status):
+        self.infection_status.update(status)
+
+    @property
+    def mask(self):
+        return FieldMapping(self, MASK_FIELDS)
+
+    @mask.setter
+    def mask(self, mask):
+        self.mask.update(mask)
+
+    @property
+    def comorbidities(self):
+        return dict(zip(self._store.comorbidity_names, self._store.comorbidities[self._row].tolist()))
+
+    @comorbidities.setter
+    def comorbidities(self, comorbidities):
+        for name, present in dict(comorbidities).items():
+            if name in self._store.comorbidity_names:
+                self._store.comorbidities[self._row, self._store.comorbidity_names.index(name)] = present
+
+    @property
+    def household_id(self):
+        household_id = self._store.household_id[self._row].item()
+        return None if household_id < 0 else household_id
+
+    @household_id.setter
+    def household_id(self, household_id):
+        self._store.household_id[self._row] = -1 if household_id is None else household_id
+        self._store.invalidate_households()
+
+    @property
+    def household(self):
+        return [AgentView(self._store, agent_id) for agent_id in self._store.household_members(self.household_id).tolist()]
+
+    @household.setter
+    def household(self, members):
+        # La pertenencia se deriva de household_id, no hace falta guardar la lista
+        pass
+
+    @property
+    def history(self):
+        return self._store.history.get(self.agent_id, []) if self._store.history is not None else []
+
+    def transition(self, new_state, reason=None):
+        """
+        Transition the agent to a new state and log the change if the store keeps history.
+
+        :param new_state: The new state of the agent.
+        :param reason: Reason for the state transition (optional).
+        """
+        if self._store.history is not None:
+            self._store.history.setdefault(self.agent_id, []).append((self.state, new_state, reason))
+        self.state = new_state
+        notify_transition(self)
+
+    def enforce_isolation(self, days):
+        self.is_isolated = True
+        self.isolation_days = days
+
+    def manage_vaccination(self, efficacy):
+        if random.random() < efficacy:
+            self.immune = True
+            self.transition(State.RECOVERED_IMMUNE, reason="Vaccination")
+
+    def release_isolation(self):
+        if self.is_isolated:
+            self.isolation_days -= 1
+            if self.isolation_days <= 0:
+                self.is_isolated = False
+                self.isolation_days = 0
+
+    def __eq__(self, other):
+        return isinstance(other, AgentView) and other._store is self._store and other.agent_id == self.agent_id
+
+    def __hash__(self):
+        return hash((id(self._store), self.agent_id))
+
+    def __repr__(self):
+        return (
+            f"AgentView(id={self.agent_id}, state={self.state}, age={self.age}, "
+            f"gender={self.gender}, occupation={self.occupation}, household_id={self.household_id}, "
+            f"municipio={self.municipio}, severity={self.severity}, immune={self.immune})"
+        )
@@ -14,21 +14,109 @@ class Severity(Enum):
     MID = 1
     SEVERE = 2
 
-    
+# Codes used by the compact agent representations (index = code)
+SEVERITIES = (None, "asymptomatic", "mild", "moderate", "severe", "critical")
+STATES_BY_VALUE = {state.value: state for state in State}
+
+INFECTION_STATUS_FIELDS = {
+    "disease": "disease",
+    "state": "state",
+    "severity": "severity",
+    "contagious": "contagious",
+    "days_infected": "days_infected",
+    "asymptomatic": "asymptomatic",
+    "immunity_days": "immunity_days",
+}
+MASK_FIELDS = {
+    "usage": "mask_usage",
+    "reduction_factor": "mask_factor",
+}
+
+# Callables notified with the agent after every transition (e.g. EpidemicCounters.record)
+_transition_listeners = []
+
+
+def add_transition_listener(listener):
+    """
+    Call ``listener(agent)`` after every agent transition, once the new state is set.
+    """
+    _transition_listeners.append(listener)
+
+
+def remove_transition_listener(listener):
+    if listener in _transition_listeners:
+        _transition_listeners.remove(listener)
+
+
+def notify_transition(agent):
+    for listener in _transition_listeners:
+        listener(agent)
+
+
+class FieldMapping:
+    """
+    Dict-like view that maps keys to attributes of an owner object.
+
+    Lets compact agents keep answering ``agent.infection_status["state"]`` or
+    ``agent.mask["usage"]`` without allocating a dict per agent.
+    """
+    __slots__ = ("_owner", "_fields")
+
+    def __init__(self, owner, fields):
+        self._owner = owner
+        self._fields = fields
+
+    def __getitem__(self, key):
+        return getattr(self._owner, self._fields[key])
+
+    def __setitem__(self, key, value):
+        setattr(self._owner, self._fields[key], value)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def get(self, key, default=None):
+        return self[key] if key in self._fields else default
+
+    def keys(self):
+        return self._fields.keys()
+
+    def values(self):
+        return [self[key] for key in self._fields]
+
+    def items(self):
+        return [(key, self[key]) for key in self._fields]
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items()) if hasattr(other, "items") else NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
 
 
 
 class BaseAgent:
-    def __init__(self, agent_id):
+    __slots__ = ("agent_id", "history")
+
+    def __init__(self, agent_id, record_history=True):
         """
         Base class for an agent in the simulation.
 
         :param agent_id: Unique identifier for the agent.
-        :param initial_state: Initial state of the agent (e.g., SUSCEPTIBLE).
-        :param attributes: Dictionary of additional attributes for the agent.
+        :param record_history: If False, transitions are not appended to ``history``.
         """
         self.agent_id = agent_id
-        self.history = []  # Records state transitions for analysis
+        self.history = [] if record_history else None  # Records state transitions for analysis
 
     def transition(self, new_state, reason=None):
         """
@@ -37,8 +125,25 @@ class BaseAgent:
         :param new_state: The new state of the agent.
         :param reason: Reason for the state transition (optional).
         """
-        self.history.append((self.infection_status['state'], new_state, reason))
+        if self.history is not None:
+            self.history.append((self.infection_status['state'], new_state, reason))
         self.state = new_state
+        notify_transition(self)
+
+    @property
+    def infectivity(self):
+        """
+        Factor applied to what the agent transmits (its mask), as AgentStore.infectivity.
+        """
+        return self.mask.get("reduction_factor", 1.0) if self.mask.get("usage", False) else 1.0
+
+    @property
+    def susceptibility(self):
+        """
+        Factor applied to what the agent receives (its mask and vaccine), as AgentStore.susceptibility.
+        """
+        effectiveness = self.vaccine_effectiveness if self.vaccinated else None
+        return self.infectivity * (1 - (effectiveness or 0.0))
 
     def __repr__(self):
         return f"BaseAgent(id={self.agent_id}, state={self.infection_status['state']}, attributes={self.attributes})"
@@ -1,10 +1,34 @@
 from epidemics_sim.agents.base_agent import BaseAgent
-from epidemics_sim.agents.base_agent import State
+from epidemics_sim.agents.base_agent import State, INFECTION_STATUS_FIELDS, MASK_FIELDS, FieldMapping
 import random
+import numpy as np
+
+# Codificacion compacta de los atributos categoricos (indice = codigo)
+GENDERS = ("male", "female")
+OCCUPATIONS = ("student", "worker", "retired")
+
+# Limites superiores de edad biologica y su tasa de mortalidad base
+MORTALITY_AGE_LIMITS = (30, 50, 70)
+MORTALITY_RATES = (0.0001, 0.001, 0.01, 0.05)
+
+
+def base_mortality_rates(ages, num_comorbidities):
+    """
+    Vectorized version of HumanAgent._calculate_base_mortality_rate.
+
+    :param ages: Array of historical ages.
+    :param num_comorbidities: Number of comorbidities per agent (array or scalar).
+    :return: Array of base mortality rates as decimals.
+    """
+    biological_age = np.asarray(ages, dtype=np.int32) + 5 * np.asarray(num_comorbidities, dtype=np.int32)
+    bins = np.searchsorted(MORTALITY_AGE_LIMITS, biological_age, side="left")
+    return np.asarray(MORTALITY_RATES)[bins]
+
+
 class HumanAgent(BaseAgent):
     def __init__(
         self, agent_id, age, gender, occupation, household_id, municipio, disease_model,
-    comorbidities=[]
+    comorbidities=[], mortality_rate=None, record_history=True, weight=1.0
     ):
         """
         Represents a human agent with attributes relevant for epidemic simulations.
@@ -17,17 +41,21 @@ class HumanAgent(BaseAgent):
         :param municipio: The municipality the agent belongs to.
         :param infection_status: Current infection details (optional, e.g., 'asymptomatic', 'severe').
         :param comorbidities: List of comorbidities (optional).
+        :param mortality_rate: Precomputed base mortality rate (optional, computed from age and comorbidities if None).
+        :param record_history: If False, state transitions are not stored in ``history``.
+        :param weight: Number of real people this agent stands for (> 1 in a scaled-down sample).
         :param attributes: Additional attributes (optional).
         :param consultorio: Assigned consultorio (primary healthcare unit).
         :param policlinico: Assigned policlínico (secondary healthcare unit).
         """
-        super().__init__(agent_id)
+        super().__init__(agent_id, record_history)
         self.age = age
         self.gender = gender
         self.occupation = occupation
         self.household_id = household_id
         self.household = []
         self.municipio = municipio
+        self.weight = weight
         self.comorbidities = comorbidities or []
         #self.infection_status = infection_status
         self.days_infected = 0  # Days since infection (reset upon recovery)
@@ -41,7 +69,7 @@ class HumanAgent(BaseAgent):
         self.is_isolated = False
         self.is_hospitalized = False
         self.asymtomathic = None
-        self.mortality_rate = self._calculate_base_mortality_rate()
+        self.mortality_rate = self._calculate_base_mortality_rate() if mortality_rate is None else mortality_rate
         self.disease_model = disease_model
         self.incubation_period = 0
         self.infection_status ={
@@ -53,7 +81,12 @@ class HumanAgent(BaseAgent):
                 "asymptomatic": None,
                 "immunity_days": 0,
             }
+        self.state = State.SUSCEPTIBLE  # Mirrors infection_status["state"], kept in sync by transition()
+
 
+    @property
+    def contagious(self):
+        return self.infection_status["contagious"]
 
     def _calculate_base_mortality_rate(self):
         """
@@ -138,3 +171,134 @@ class HumanAgent(BaseAgent):
 
 
 # Example functions for severity and recovery
+
+
+# Bits of CompactHumanAgent._flags
+CONTAGIOUS = 1
+ASYMPTOMATIC = 2
+IMMUNE = 4
+VACCINATED = 8
+MASK_USAGE = 16
+ISOLATED = 32
+HOSPITALIZED = 64
+
+
+# Tuplas de nombres de comorbilidades compartidas por todos los agentes compactos
+_COMORBIDITY_NAMES = {}
+
+
+def _flag_property(bit):
+    def fget(self):
+        return bool(self._flags & bit)
+
+    def fset(self, value):
+        if value:
+            self._flags |= bit
+        else:
+            self._flags &= ~bit
+
+    return property(fget, fset)
+
+
+class CompactHumanAgent(BaseAgent):
+    __slots__ = (
+        "age", "gender", "occupation", "household_id", "household", "municipio", "weight", "_comorbidity_names", "_comorbidity_flags",
+        "mortality_rate", "incubation_period", "vaccine_effectiveness", "mask_factor", "isolation_days",
+        "state", "severity", "disease", "days_infected", "immunity_days", "_flags",
+    )
+
+    def __init__(
+        self, agent_id, age, gender, occupation, household_id, municipio, disease_model,
+        comorbidities=[], mortality_rate=None, record_history=True, weight=1.0
+    ):
+        """
+        Memory-compact HumanAgent: slotted, with the infection status and mask stored as plain
+        fields and the boolean attributes packed in a bitfield.
+
+        ``infection_status`` and ``mask`` are served through FieldMapping views, so
+        ``agent.infection_status["state"]`` keeps working. Same parameters as HumanAgent;
+        ``disease_model`` is accepted for compatibility and not stored.
+        """
+        super().__init__(agent_id, record_history)
+        self.age = age
+        self.gender = gender
+        self.occupation = occupation
+        self.household_id = household_id
+        self.household = None
+        self.municipio = municipio
+        self.weight = weight
+        self.comorbidities = comorbidities or []
+        self.mortality_rate = self._calculate_base_mortality_rate() if mortality_rate is None else mortality_rate
+        self.incubation_period = 0
+        self.vaccine_effectiveness = None
+        self.mask_factor = 1
+        self.isolation_days = 0
+        self.state = State.SUSCEPTIBLE
+        self.severity = None
+        self.disease = ""
+        self.days_infected = 0
+        self.immunity_days = 0
+        self._flags = 0
+
+    contagious = _flag_property(CONTAGIOUS)
+    asymptomatic = _flag_property(ASYMPTOMATIC)
+    immune = _flag_property(IMMUNE)
+    vaccinated = _flag_property(VACCINATED)
+    mask_usage = _flag_property(MASK_USAGE)
+    is_isolated = _flag_property(ISOLATED)
+    is_hospitalized = _flag_property(HOSPITALIZED)
+
+    @property
+    def infection_status(self):
+        return FieldMapping(self, INFECTION_STATUS_FIELDS)
+
+    @infection_status.setter
+    def infection_status(self, status):
+        self.infection_status.update(status)
+
+    @property
+    def mask(self):
+        return FieldMapping(self, MASK_FIELDS)
+
+    @mask.setter
+    def mask(self, mask):
+        self.mask.update(mask)
+
+    @property
+    def comorbidities(self):
+        names = self._comorbidity_names
+        return {name: bool(self._comorbidity_flags >> i & 1) for i, name in enumerate(names)}
+
+    @comorbidities.setter
+    def comorbidities(self, comorbidities):
+        # Un dict {nombre: bool} o una lista de nombres presentes, guardado como bits
+        if not isinstance(comorbidities, dict):
+            comorbidities = dict.fromkeys(comorbidities, True)
+        names = tuple(comorbidities)
+        self._comorbidity_names = _COMORBIDITY_NAMES.setdefault(names, names)
+        self._comorbidity_flags = sum(1 << i for i, present in enumerate(comorbidities.values()) if present)
+
+    _calculate_base_mortality_rate = HumanAgent._calculate_base_mortality_rate
+    enforce_isolation = HumanAgent.enforce_isolation
+    manage_vaccination = HumanAgent.manage_vaccination
+
+    def enforce_policies(self, policies):
+        pass
+
+    def release_isolation(self):
+        """
+        Release an agent from isolation once the period ends.
+        """
+        if self.is_isolated:
+            self.isolation_days -= 1
+            if self.isolation_days <= 0:
+                self.is_isolated = False
+                self.isolation_days = 0
+
+    def __repr__(self):
+        return (
+            f"CompactHumanAgent(id={self.agent_id}, state={self.state}, age={self.age}, "
+            f"gender={self.gender}, occupation={self.occupation}, household_id={self.household_id}, "
+            f"municipio={self.municipio}, comorbidities={self.comorbidities}, severity={self.severity}, "
+            f"immune={self.immune})"
+        )
@@ -0,0 +1,41 @@
+from .disease_model import DiseaseModel
+from .compartments import CompartmentMachine
+
+
+class CompartmentalModel(DiseaseModel):
+    def __init__(self, name, transmission_rate, compartments, immunity_duration=0):
+        """
+        Disease defined only by its JSON: transmission rate plus a compartment state machine.
+
+        The progression runs on the event calendar (DailySimulation rejects it with
+        event_calendar=False), so new diseases do not need a subclass with their own progression code.
+
+        :param name: Name of the disease.
+        :param transmission_rate: Probability of transmission per contact.
+        :param compartments: CompartmentMachine.
+        :param immunity_duration: Informative; the waning of immunity is part of the compartments.
+        """
+        super().__init__(
+            name,
+            transmission_rate,
+            None,
+            0.0,
+            0.0,
+            immunity_duration,
+            recovery_rates={},
+            severity_durations={},
+            progresion_rates={},
+            compartments=compartments,
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create the model from a disease JSON with "name", "transmission_rate" and "compartments".
+        """
+        return cls(
+            config["name"],
+            config["transmission_rate"],
+            CompartmentMachine(config["compartments"], constants=config),
+            immunity_duration=config.get("immunity_duration", 0),
+        )
@@ -0,0 +1,249 @@
+import numpy as np
+from epidemics_sim.agents.base_agent import State
+
+# Agent attributes that branching probabilities can be keyed on
+RISK_FACTORS = ("mortality_rate", "age")
+
+
+class CompartmentMachine:
+    def __init__(self, definition, constants=None):
+        """
+        Disease progression as a declarative state machine, compiled from the disease JSON.
+
+        ``definition`` has an ``initial`` compartment and a ``states`` mapping. Each
+        compartment declares the agent ``state`` (a State name), ``severity`` and
+        ``contagious`` flag applied on entry, and how it is left:
+
+        - ``"dwell"``: days spent in the compartment, ``{"normal": [mean, sd], "min": 0}`` or
+          ``{"fixed": days}``, followed by ``"next"``: branches ``{"to", "probability"}`` chosen
+          once (a branch without probability takes the remaining probability).
+        - ``"daily"``: ``{"after": days, "next": [...]}``: from day ``after`` in the compartment
+          (the day of entry is day 1, and it is never tried on that day), each branch is tried
+          once per day in order until one happens (e.g. death, then recovery). With the
+          severity duration as ``after`` this matches progress_infection.
+        - Neither: the compartment is final.
+
+        A probability is a number, ``{"risk": factor, "limits": [...], "values": [...]}``
+        (looked up by the bin of the agent's risk factor; with ``"column"``, ``values`` is a
+        table with one row per bin) or ``{"combined_mortality": base}`` (the agent's mortality
+        combined with a base rate, as calculate_critical_mortality_rate).
+
+        Any number or list can instead name an entry of ``constants``, with dots for nested
+        keys (``"recovery_rates.mild"``), so the definition reuses the disease parameters
+        instead of copying them.
+
+        Everything is compiled into per-compartment tables, so a whole cohort leaving a
+        compartment is handled with a few vectorized draws.
+
+        :param definition: Dictionary with "initial" and "states".
+        :param constants: Disease parameters that probabilities can refer to by name
+                          (e.g. the rest of covid.json).
+        """
+        constants = constants or {}
+        states = definition["states"]
+        self.names = list(states)
+        codes = {name: code for code, name in enumerate(self.names)}
+        if definition["initial"] not in codes:
+            raise ValueError(f"Unknown initial compartment: {definition['initial']}")
+        self.initial = codes[definition["initial"]]
+        self.state = [State[spec["state"]] for spec in states.values()]
+        self.severity = [spec.get("severity") for spec in states.values()]
+        self.contagious = [bool(spec.get("contagious", False)) for spec in states.values()]
+        self.exits = [_compile_exit(name, spec, codes, constants) for name, spec in states.items()]
+        self.current = {}  # ID -> compartment of the agents with a pending exit
+
+    def infect(self, agents, day, calendar, rng, disease_name=""):
+        """
+        Put newly infected agents in the initial compartment and schedule their exit.
+        """
+        self._enter(self.initial, agents, day, calendar, rng, disease_name)
+
+    def process(self, day, calendar, agents, rng, disease_name=""):
+        """
+        Move the agents whose compartment exit is scheduled for ``day``.
+
+        :return: Ids of the agents that changed compartment.
+        """
+        changed = []
+        events = calendar.pop(day)
+        while events:
+            cohorts = {}
+            for code, agent_id in events:
+                agent = agents[agent_id]
+                # Eventos de agentes que cambiaron de estado por otra vía (p. ej. vacunados) se descartan
+                if self.current.get(agent_id) == code and agent.state is self.state[code]:
+                    cohorts.setdefault(code, []).append(agent)
+            for code, cohort in cohorts.items():
+                targets = self.exits[code].choose(_risk_factors(cohort), rng)
+                for target in np.unique(targets).tolist():
+                    group = [agent for agent, chosen in zip(cohort, (targets == target).tolist()) if chosen]
+                    self._enter(target, group, day, calendar, rng, disease_name)
+                changed.extend(agent.agent_id for agent in cohort)
+            events = calendar.pop(day)  # Compartimentos de permanencia 0 se dejan el mismo día
+        return changed
+
+    def _enter(self, code, cohort, day, calendar, rng, disease_name):
+        state, severity, contagious = self.state[code], self.severity[code], self.contagious[code]
+        exit = self.exits[code]
+        days = exit.dwell(_risk_factors(cohort), rng) if exit is not None else np.full(len(cohort), -1)
+
+        for agent, dwell in zip(cohort, days.tolist()):
+            status = agent.infection_status
+            changes_state = (agent.state, status["severity"]) != (state, severity)
+            if state is State.SUSCEPTIBLE:
+                status.update({
+                    "state": State.SUSCEPTIBLE,
+                    "disease": "",
+                    "severity": None,
+                    "contagious": False,
+                    "days_infected": 0,
+                    "asymptomatic": None,
+                    "immunity_days": 0
+                })
+                agent.immune = False
+            else:
+                status.update({"state": state, "severity": severity, "contagious": contagious})
+                if code == self.initial:
+                    agent.incubation_period = max(dwell, 0)
+                    status["days_infected"] = 0
+                    status["asymptomatic"] = None  # Lo define la rama que se tome después
+                elif state is State.INFECTED and severity is not None:
+                    status["asymptomatic"] = severity == "asymptomatic"
+                elif state is State.RECOVERED:
+                    status["days_infected"] = 0
+                    status["immunity_days"] = max(dwell, 0)
+            if changes_state:
+                agent.transition(state, reason=f"{disease_name} {self.names[code]}".strip())
+
+            if dwell >= 0:
+                self.current[agent.agent_id] = code
+                calendar.schedule(day + dwell, code, agent.agent_id)
+            else:
+                self.current.pop(agent.agent_id, None)
+
+
+class _Exit:
+    def __init__(self, targets, probabilities, daily, dwell=None, after=0):
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.probabilities = probabilities  # One callable per branch: risk factors -> array
+        self.daily = daily
+        self._dwell = dwell
+        self.after = after
+
+    def branch_probabilities(self, factors, size):
+        probabilities = np.column_stack([np.broadcast_to(p(factors), size) for p in self.probabilities])
+        if self.daily:
+            # Ramas probadas en orden cada día: P(rama i) = p_i * prod_{j<i} (1 - p_j)
+            not_before = np.cumprod(np.column_stack((np.ones(size), 1 - probabilities[:, :-1])), axis=1)
+            return probabilities * not_before
+        return probabilities
+
+    def dwell(self, factors, rng):
+        """
+        Days until the agents leave the compartment (-1 = never).
+        """
+        size = len(next(iter(factors.values())))
+        if not self.daily:
+            return self._dwell(size, rng)
+        leaves = self.branch_probabilities(factors, size).sum(axis=1)
+        days = np.full(size, -1, dtype=np.int64)
+        resolves = leaves > 0
+        first_try = max(self.after - 1, 1)  # Días después de la entrada
+        days[resolves] = first_try + rng.geometric(np.minimum(leaves[resolves], 1.0)) - 1
+        return days
+
+    def choose(self, factors, rng):
+        """
+        Compartment each agent moves to.
+        """
+        size = len(next(iter(factors.values())))
+        probabilities = self.branch_probabilities(factors, size)
+        cumulative = np.cumsum(probabilities, axis=1)
+        # En "daily" se elige entre las ramas que ocurrieron, normalizando por su total
+        draws = rng.random(size) * (cumulative[:, -1] if self.daily else 1.0)
+        branch = np.minimum((draws[:, None] >= cumulative).sum(axis=1), len(self.targets) - 1)
+        return self.targets[branch]
+
+
+def _compile_exit(name, spec, codes, constants):
+    if "daily" in spec:
+        daily = spec["daily"]
+        targets, probabilities = _compile_branches(name, daily["next"], codes, constants, remainder=False)
+        after = int(_constant(daily.get("after", 1), constants))
+        return _Exit(targets, probabilities, daily=True, after=after)
+    if "dwell" in spec:
+        targets, probabilities = _compile_branches(name, spec.get("next", []), codes, constants, remainder=True)
+        return _Exit(targets, probabilities, daily=False, dwell=_compile_dwell(name, spec["dwell"], constants))
+    return None
+
+
+def _compile_dwell(name, dwell, constants):
+    minimum = dwell.get("min", 0)
+    if "fixed" in dwell:
+        days = int(_constant(dwell["fixed"], constants))
+        return lambda size, rng: np.full(size, days, dtype=np.int64)
+    if "normal" in dwell:
+        mean, sd = _constant(dwell["normal"], constants)
+        return lambda size, rng: np.maximum(np.round(rng.normal(mean, sd, size)), minimum).astype(np.int64)
+    raise ValueError(f"Unknown dwell distribution in compartment {name}: {dwell}")
+
+
+def _compile_branches(name, branches, codes, constants, remainder):
+    if not branches:
+        raise ValueError(f"Compartment {name} has an exit but no next compartments")
+    targets, probabilities = [], []
+    for branch in branches:
+        if branch["to"] not in codes:
+            raise ValueError(f"Unknown compartment {branch['to']} in {name}")
+        targets.append(codes[branch["to"]])
+        if "probability" in branch:
+            probabilities.append(_compile_probability(branch["probability"], constants))
+        elif remainder and branch is branches[-1]:
+            given = list(probabilities)
+            probabilities.append(lambda factors, given=given: 1.0 - sum(p(factors) for p in given))
+        else:
+            raise ValueError(f"Branch {name} -> {branch['to']} needs a probability")
+    return targets, probabilities
+
+
+def _compile_probability(spec, constants):
+    spec = _constant(spec, constants)
+    if isinstance(spec, (int, float)):
+        value = float(spec)
+        return lambda factors: value
+    if "combined_mortality" in spec:
+        base = _constant(spec["combined_mortality"], constants)
+        return lambda factors: 1 - (1 - factors["mortality_rate"]) * (1 - base)
+    if "risk" in spec:
+        if spec["risk"] not in RISK_FACTORS:
+            raise ValueError(f"Unknown risk factor: {spec['risk']}")
+        factor = spec["risk"]
+        limits = np.asarray(_constant(spec["limits"], constants), dtype=np.float64)
+        values = np.asarray(_constant(spec["values"], constants), dtype=np.float64)
+        if "column" in spec:
+            values = values[:, spec["column"]]
+        if len(values) != len(limits) + 1:
+            raise ValueError("A risk-keyed probability needs one value per bin (len(limits) + 1)")
+        return lambda factors: values[np.searchsorted(limits, factors[factor], side="right")]
+    raise ValueError(f"Unknown probability: {spec}")
+
+
+def _constant(value, constants):
+    """
+    ``value`` itself, or the entry of ``constants`` it names ("a.b" for nested keys).
+    """
+    if not isinstance(value, str):
+        return value
+    entry = constants
+    for key in value.split("."):
+        if not isinstance(entry, dict) or key not in entry:
+            raise ValueError(f"Unknown disease parameter: {value}")
+        entry = entry[key]
+    return entry
+
+
+def _risk_factors(cohort):
+    return {
+        factor: np.array([getattr(agent, factor) for agent in cohort], dtype=np.float64)
+        for factor in RISK_FACTORS
+    }
@@ -1,12 +1,31 @@
+import numpy as np
 from .disease_model import DiseaseModel
-import random
+from .compartments import CompartmentMachine
+from epidemics_sim.agents.base_agent import SEVERITIES
+from epidemics_sim.simulation.sampling import AliasTable
 
+SEVERITY_LEVELS = ["mild", "moderate", "severe", "critical"]
+
+# Límites de la tasa de mortalidad del agente y distribución de severidad de cada nivel de riesgo
+# (se pueden reemplazar con "risk_limits" y "severity_by_risk" en covid.json)
+RISK_LIMITS = (0.001, 0.01, 0.05)
+SEVERITY_BY_RISK = (
+    (0.85, 0.12, 0.02, 0.01),  # Bajo riesgo: mayor probabilidad de síntomas leves
+    (0.6, 0.25, 0.1, 0.05),    # Riesgo moderado: riesgo equilibrado
+    (0.4, 0.3, 0.2, 0.1),      # Riesgo alto: más probabilidad de severidad
+    (0.2, 0.3, 0.3, 0.2),      # Riesgo muy alto: mayor probabilidad de estado crítico
+)
+CONFIG_KEYS = (
+    "transmission_rate", "incubation_period", "asymptomatic_probability", "base_mortality_rate",
+    "immunity_duration", "recovery_rates", "severity_durations", "progression_rates",
+)
 
 
 class CovidModel(DiseaseModel):
     def __init__(
         self, transmission_rate, incubation_period, asymptomatic_probability, base_mortality_rate,
-        immunity_duration, recovery_rates, severity_durations, progression_rates
+        immunity_duration, recovery_rates, severity_durations, progression_rates,
+        risk_limits=RISK_LIMITS, severity_by_risk=SEVERITY_BY_RISK, compartments=None
     ):
         # recovery_rates = {
         #     "asymptomatic": 0.99,
@@ -30,7 +49,30 @@ class CovidModel(DiseaseModel):
             immunity_duration,  # COVID-19: 90 días de inmunidad
             recovery_rates,
             severity_durations,
-            progression_rates
+            progression_rates,
+            compartments=compartments,
+        )
+        if len(severity_by_risk) != len(risk_limits) + 1:
+            raise ValueError("severity_by_risk needs one distribution per risk level (len(risk_limits) + 1)")
+        self.risk_limits = np.asarray(risk_limits, dtype=np.float64)
+        self.severity_tables = tuple(AliasTable(SEVERITY_LEVELS, weights) for weights in severity_by_risk)
+        # Tablas para sortear la severidad de una cohorte completa: distribución acumulada por nivel de riesgo
+        probabilities = np.asarray(severity_by_risk, dtype=np.float64)
+        self.severity_cdf = np.cumsum(probabilities / probabilities.sum(axis=1, keepdims=True), axis=1)
+        self.severity_codes = np.array([SEVERITIES.index(level) for level in SEVERITY_LEVELS])
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Crea el modelo a partir del contenido de covid.json. Si trae "compartments", la
+        progresión la lleva la máquina de estados compilada de esa sección.
+        """
+        compartments = config.get("compartments")
+        return cls(
+            *[config[key] for key in CONFIG_KEYS],
+            risk_limits=config.get("risk_limits", RISK_LIMITS),
+            severity_by_risk=config.get("severity_by_risk", SEVERITY_BY_RISK),
+            compartments=CompartmentMachine(compartments, constants=config) if compartments else None,
         )
 
     def determine_severity(self, agent): # TODO: ver si el agente esta vacunado
@@ -41,15 +83,21 @@ class CovidModel(DiseaseModel):
         :return: Severity level ('mild', 'moderate', 'severe', 'critical').
         """
         # Usamos la tasa de mortalidad del agente como referencia
-        mortality = agent.mortality_rate  
-
-        if mortality < 0.001:  # Bajo riesgo
-            probabilities = [0.85, 0.12, 0.02, 0.01]  # Mayor probabilidad de síntomas leves
-        elif mortality < 0.01:  # Riesgo moderado
-            probabilities = [0.6, 0.25, 0.1, 0.05]  # Riesgo equilibrado
-        elif mortality < 0.05:  # Riesgo alto
-            probabilities = [0.4, 0.3, 0.2, 0.1]  # Más probabilidad de severidad
-        else:  # Riesgo muy alto
-            probabilities = [0.2, 0.3, 0.3, 0.2]  # Mayor probabilidad de estado crítico
-
-        return random.choices(["mild", "moderate", "severe", "critical"], probabilities)[0]
+        mortality = agent.mortality_rate
+        risk = 0
+        while risk < len(self.risk_limits) and mortality >= self.risk_limits[risk]:
+            risk += 1
+        return self.severity_tables[risk].sample()
+
+    def determine_severities(self, agents, rng):
+        """
+        Severidades de una cohorte de agentes con un único sorteo vectorizado.
+
+        :param agents: Agentes que terminan la incubación con síntomas.
+        :param rng: numpy.random.Generator.
+        :return: Arreglo de códigos de severidad (índices en SEVERITIES).
+        """
+        mortality = np.array([agent.mortality_rate for agent in agents], dtype=np.float64)
+        risk = np.searchsorted(self.risk_limits, mortality, side="right")
+        level = (rng.random(len(agents))[:, None] >= self.severity_cdf[risk]).sum(axis=1)
+        return self.severity_codes[np.minimum(level, len(SEVERITY_LEVELS) - 1)]
@@ -1,9 +1,17 @@
 import random
 from abc import ABC, abstractmethod
-from epidemics_sim.agents.base_agent import State
+import numpy as np
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.agents.base_agent import State, SEVERITIES
+from epidemics_sim.simulation.event_calendar import ONSET, OUTCOME, WANING
 import math
 from epidemics_sim.simulation.logger import setup_logger
 logger = setup_logger()
+
+ASYMPTOMATIC_CODE = SEVERITIES.index("asymptomatic")
+CRITICAL_CODE = SEVERITIES.index("critical")
+
+
 class DiseaseModel(ABC):
     def __init__(
         self,
@@ -16,6 +24,7 @@ class DiseaseModel(ABC):
         recovery_rates,
         severity_durations,
         progresion_rates,
+        compartments=None,
     ):
         """
         Base class for diseases transmitted by contact.
@@ -28,6 +37,9 @@ class DiseaseModel(ABC):
         :param recovery_rates: Dictionary of recovery rates by severity.
         :param severity_durations: Dictionary of durations by severity.
         :param immunity_duration: Number of days agents remain immune after recovery (0 = no immunity).
+        :param compartments: Optional CompartmentMachine compiled from the disease JSON; when given,
+                             the event calendar progresses infections through its compartments
+                             instead of the built-in incubation/severity/outcome events.
         """
         self.name = name
         self.transmission_rate = transmission_rate
@@ -39,6 +51,11 @@ class DiseaseModel(ABC):
         self.severity_durations = severity_durations
         self.immunity_duration = immunity_duration  # Guardamos el tiempo de inmunidad
         self.progression_rates = progresion_rates
+        # Parámetros por severidad como tablas indexadas por código (SEVERITIES), con los mismos
+        # valores por defecto que progress_infection
+        self.recovery_table = np.array([recovery_rates.get(severity, 1.0) for severity in SEVERITIES], dtype=np.float64)
+        self.duration_table = np.array([severity_durations.get(severity, 10) for severity in SEVERITIES], dtype=np.int64)
+        self.compartments = compartments
 
     
     def initialize_infections(self, agents):
@@ -72,38 +89,25 @@ class DiseaseModel(ABC):
         for time_period, interactions in daily_interactions.items():
             for id1, id2 in interactions:  # Each interaction is a tuple (agent1, agent2)
                 count_interaction += 1
-                if agents[id1].is_isolated or agents[id2].is_isolated or agents[id1].is_hospitalized or agents[id2].is_hospitalized:
+                agent1, agent2 = agents[id1], agents[id2]
+                if agent1.is_isolated or agent2.is_isolated or agent1.is_hospitalized or agent2.is_hospitalized:
                     print("Estan llegando agentes isolados u hospitalizados a la propagacion")
                 # Aqui no deben llegar agentes isolados u hospitalizados porque los quito de las interaciones en simulate_day
                 logger.info("Agentes que se infestaron dentro de propagate")
-                if agents[id1].infection_status["state"] is State.INFECTED and agents[id1].infection_status["contagious"] and agents[id2].infection_status["state"] is State.SUSCEPTIBLE and not agents[id2].immune:
+                if agent1.state is State.INFECTED and agent1.contagious and agent2.state is State.SUSCEPTIBLE and not agent2.immune:
                     transmission_probability = self.calculate_transmission_probability(id1, id2,agents)
                     if random.random() < transmission_probability:
                         count_evaluation += 1
-                        agents[id2].transition(State.INFECTED, reason=f"Infected by {self.name}")
-                        agents[id2].infection_status["disease"] = self.name
-                        agents[id2].infection_status["state"] = State.INFECTED
-                        agents[id2].infection_status["contagious"] = True
-                        agents[id2].infection_status["severity"] = None
-                        agents[id2].infection_status["days_infected"] = 0
-                        agents[id2].infection_status["asymptomatic"] = random.random() < self.asymptomatic_probability
-                        agents[id2].infection_status["immunity_days"] = self.immunity_duration
-                        new[count_evaluation] = agents[id2]
+                        self._infect(agent2)
+                        new[count_evaluation] = agent2
                         logger.debug(f"Infestado el agente {id2}")
                 
-                if agents[id2].infection_status["state"] is State.INFECTED and agents[id2].infection_status["contagious"] and agents[id1].infection_status["state"] is State.SUSCEPTIBLE and not agents[id1].immune:
+                if agent2.state is State.INFECTED and agent2.contagious and agent1.state is State.SUSCEPTIBLE and not agent1.immune:
                     transmission_probability = self.calculate_transmission_probability(id2, id1,agents) 
                     if random.random() < transmission_probability:
                         count_evaluation += 1
-                        agents[id1].transition(State.INFECTED, reason=f"Infected by {self.name}")
-                        agents[id1].infection_status["disease"] = self.name
-                        agents[id1].infection_status["state"] = State.INFECTED
-                        agents[id1].infection_status["contagious"] = True
-                        agents[id1].infection_status["severity"] = None
-                        agents[id1].infection_status["days_infected"] = 0
-                        agents[id1].infection_status["asymptomatic"] = random.random() < self.asymptomatic_probability
-                        agents[id1].infection_status["immunity_days"] = self.immunity_duration
-                        new[count_evaluation] = agents[id1]
+                        self._infect(agent1)
+                        new[count_evaluation] = agent1
                         logger.debug(f"Infestado el agente {id1}")
                 
                 # if (agents[id1].infection_status["state"] is State.INFECTED or agents[id2].infection_status["state"] is State.INFECTED):
@@ -115,6 +119,147 @@ class DiseaseModel(ABC):
         
                 
 
+    def propagate_arrays(self, layer_contacts, agents, rng=None):
+        """
+        Vectorized propagate over interaction arrays; propagate stays as the reference loop.
+
+        Every contact is evaluated in both directions and in the same order as propagate,
+        and an agent infected by an earlier contact transmits through the later ones, so
+        infections chain within the call as in the sequential loop (see transmit_arrays).
+        Requires an AgentStore; other agent mappings go through propagate.
+
+        :param layer_contacts: Dictionary layer -> (sources, targets) arrays of agent ids.
+        :param agents: Agent mapping.
+        :param rng: numpy.random.Generator (one seeded from ``random`` by default).
+        :return: Dictionary of newly infected agents, as returned by propagate.
+        """
+        if not isinstance(agents, AgentStore):
+            return self.propagate({
+                layer: list(zip(np.asarray(sources).tolist(), np.asarray(targets).tolist()))
+                for layer, (sources, targets) in layer_contacts.items()
+            }, agents)
+        sources = np.concatenate([np.asarray(s, dtype=np.int64) for s, _ in layer_contacts.values()] + [np.zeros(0, np.int64)])
+        targets = np.concatenate([np.asarray(t, dtype=np.int64) for _, t in layer_contacts.values()] + [np.zeros(0, np.int64)])
+        # Las dos direcciones de cada contacto, intercaladas en el mismo orden que propagate
+        return self.transmit_arrays(
+            np.column_stack((sources, targets)).ravel(), np.column_stack((targets, sources)).ravel(), agents, rng
+        )
+
+    def transmit_arrays(self, sources, targets, agents, rng=None, order=None):
+        """
+        Vectorized transmit with the semantics of the sequential loop.
+
+        ``order`` is the position at which the loop would evaluate each (directed) contact;
+        by default the contacts are evaluated in array order. A contact can transmit when
+        its source is contagious at the start of the call or was infected by a contact with
+        a lower position, so infections chain through the contacts exactly as in propagate.
+        Each Bernoulli trial is drawn once (transmission_hits) and the position at which each
+        agent gets infected is found from the successful contacts (infection_order).
+
+        :param sources: Ids of the possible transmitters.
+        :param targets: Ids of the other agent of each contact.
+        :param agents: Agent mapping (AgentStore or dict).
+        :param rng: numpy.random.Generator (one seeded from ``random`` by default).
+        :param order: Evaluation position of each contact (distinct integers).
+        :return: Dictionary of newly infected agents, in infection order, as returned by propagate.
+        """
+        rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        hits = self.transmission_hits(sources, targets, agents, rng, order)
+        return self.infect_ids(self.infection_order(*hits, agents), agents)
+
+    def transmission_hits(self, sources, targets, agents, rng, order=None):
+        """
+        Draw the transmission trial of every contact that could transmit.
+
+        A contact is a candidate when its target is susceptible and its source is contagious
+        or susceptible (it may be infected by an earlier contact). The agents' state is not
+        changed.
+
+        :return: Tuple (sources, targets, order) of the contacts whose trial succeeded.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.arange(len(sources), dtype=np.int64) if order is None else np.asarray(order, dtype=np.int64)
+        source_contagious, source_susceptible = _transmission_status(sources, agents)
+        _, target_susceptible = _transmission_status(targets, agents)
+        candidate = target_susceptible & (source_contagious | source_susceptible)
+        sources, targets, order = sources[candidate], targets[candidate], order[candidate]
+
+        if isinstance(agents, AgentStore):
+            probability = self.transmission_probabilities(sources - agents.first_id, targets - agents.first_id, agents)
+        else:
+            probability = np.array([
+                self.calculate_transmission_probability(source, target, agents)
+                for source, target in zip(sources.tolist(), targets.tolist())
+            ], dtype=np.float64)
+        hit = rng.random(len(sources)) < probability
+        return sources[hit], targets[hit], order[hit]
+
+    def infection_order(self, sources, targets, order, agents):
+        """
+        Agents infected through successful contacts, as the sequential loop would infect them.
+
+        An agent is infected at the lowest position among the successful contacts towards it
+        whose source was contagious at the start or infected at a lower position. Positions
+        are relaxed over all the contacts until they no longer change (one pass per link of
+        the longest chain of infections).
+
+        :return: Array of the ids of the newly infected agents, ordered by infection position.
+        """
+        if not len(sources):
+            return np.zeros(0, dtype=np.int64)
+        ids, index = np.unique(np.concatenate((sources, targets)), return_inverse=True)
+        source_index, target_index = index[:len(sources)], index[len(sources):]
+        contagious, _ = _transmission_status(ids, agents)
+        never = np.iinfo(np.int64).max
+        infected_at = np.where(contagious, -1, never)  # Posición en que se infecta cada agente
+        while True:
+            reached = infected_at[source_index] < order
+            updated = infected_at.copy()
+            np.minimum.at(updated, target_index[reached], order[reached])
+            if np.array_equal(updated, infected_at):
+                break
+            infected_at = updated
+        new = (infected_at >= 0) & (infected_at < never)
+        return ids[new][np.argsort(infected_at[new], kind="stable")]
+
+    def infect_ids(self, agent_ids, agents):
+        """
+        Infect the given agents, in order.
+
+        :return: Dictionary of newly infected agents, as returned by propagate.
+        """
+        new = {}
+        for agent_id in np.asarray(agent_ids).tolist():
+            agent = agents[agent_id]
+            self._infect(agent)
+            new[len(new) + 1] = agent
+        return new
+
+    def transmission_probabilities(self, sources, targets, agents):
+        """
+        calculate_transmission_probability for arrays of AgentStore rows: a gather of the
+        cached multipliers (AgentStore.update_multipliers) and a product.
+        """
+        return self.transmission_rate * agents.infectivity[sources] * agents.susceptibility[targets]
+
+    def _infect(self, agent):
+        """
+        Move a susceptible agent to the infected state.
+
+        :param agent: The agent being infected.
+        """
+        agent.transition(State.INFECTED, reason=f"Infected by {self.name}")
+        status = agent.infection_status
+        status["disease"] = self.name
+        status["state"] = State.INFECTED
+        status["contagious"] = True
+        status["severity"] = None
+        status["days_infected"] = 0
+        # Con compartimentos lo decide la rama que toma el agente al terminar la incubación
+        status["asymptomatic"] = random.random() < self.asymptomatic_probability if self.compartments is None else None
+        status["immunity_days"] = self.immunity_duration
+
     # def _evaluate_transmission(self, interaction, agents):
     #     """
     #     Evaluate transmission between two agents.
@@ -169,21 +314,14 @@ class DiseaseModel(ABC):
         """
         Calculate the transmission probability specific to the disease.
 
+        The masks of both agents and the vaccine of the target scale the transmission rate
+        (see BaseAgent.infectivity and susceptibility; AgentStore keeps them cached).
+
         :param source: Source agent.
         :param target: Target agent.
         :return: Transmission probability.
         """
-        probability = self.transmission_rate
-
-        # Adjust for vaccination status
-        if agents[target].vaccinated:
-            probability = (1 - target.vaccine_effectiveness)
-
-        source_mask_factor = agents[source].mask.get("reduction_factor", 1.0) if agents[source].mask.get("usage", False) else 1.0
-        target_mask_factor = agents[target].mask.get("reduction_factor", 1.0) if agents[target].mask.get("usage", False) else 1.0
-
-        probability *= source_mask_factor * target_mask_factor  # Se multiplica el efecto de ambas mascarillas
-        return probability
+        return self.transmission_rate * agents[source].infectivity * agents[target].susceptibility
 
 
 
@@ -216,7 +354,7 @@ class DiseaseModel(ABC):
     #             })
     #             agents[agent].transition(State.INFECTED, reason=f"{self.name} infection")
     #         else:
-    #             severity = self.determine_severity(agents[agent])
+    #             severity = self.determine_severity(agent)
     #             agents[agent].infection_status.update({
     #                 "severity": severity,
     #                 "state": State.INFECTED
@@ -313,72 +451,74 @@ class DiseaseModel(ABC):
 
         :param agent: The agent whose infection state is being progressed.
         """
-        if agents[agent].infection_status["days_infected"] == 0:
-            agents[agent].incubation_period = round(random.gauss(self.mean_incubation_period[0], self.mean_incubation_period[1]))
+        agent = agents[agent]
+        status = agent.infection_status
+        if status["days_infected"] == 0:
+            agent.incubation_period = round(random.gauss(self.mean_incubation_period[0], self.mean_incubation_period[1]))
 
-        agents[agent].infection_status["days_infected"] += 1
-        days_infected = agents[agent].infection_status["days_infected"]
+        status["days_infected"] += 1
+        days_infected = status["days_infected"]
 
         # 1️⃣ INCUBACIÓN: No síntomas ni transmisión hasta que termine
-        if days_infected <= agents[agent].incubation_period:
-            agents[agent].infection_status["contagious"] = False
+        if days_infected <= agent.incubation_period:
+            status["contagious"] = False
             return
 
         # 2️⃣ FIN DE INCUBACIÓN: Definir severidad y contagiosidad
-        if days_infected == agents[agent].incubation_period + 1:
-            agents[agent].infection_status["contagious"] = True  # Ya puede contagiar
-            if agents[agent].infection_status["asymptomatic"]:
-                agents[agent].infection_status.update({
+        if days_infected == agent.incubation_period + 1:
+            status["contagious"] = True  # Ya puede contagiar
+            if status["asymptomatic"]:
+                status.update({
                     "severity": "asymptomatic",
                     "state": State.INFECTED
                 })
-                agents[agent].transition(State.INFECTED, reason=f"{self.name} infection")
+                agent.transition(State.INFECTED, reason=f"{self.name} infection")
             else: # Si es asintomatico no se le determina la severidad
-                severity = self.determine_severity(agents[agent])
-                agents[agent].infection_status.update({
+                severity = self.determine_severity(agent)
+                status.update({
                     "severity": severity,
                     "state": State.INFECTED
                 })
-                agents[agent].transition(State.INFECTED, reason=f"{self.name} infection ({severity})")
+                agent.transition(State.INFECTED, reason=f"{self.name} infection ({severity})")
             return
 
         # 3️⃣ PROGRESIÓN: Evaluar recuperación o muerte
-        severity = agents[agent].infection_status.get("severity", "mild")
+        severity = status.get("severity", "mild")
         recovery_days = self.severity_durations.get(severity, 10)  # Tiempo de recuperación
 
-        if days_infected >= agents[agent].incubation_period + recovery_days:
+        if days_infected >= agent.incubation_period + recovery_days:
             # 3.1️⃣ CASOS CRÍTICOS: Posibilidad de muerte
-            if severity == "critical" and random.random() < agents[agent].update_mortality_rate(self.base_mortality_rate):
-                agents[agent].infection_status.update({
+            if severity == "critical" and random.random() < self.calculate_critical_mortality_rate(agent.mortality_rate):
+                status.update({
                     "state": State.DECEASED,
                     "contagious": False,
                     "severity": "critical"
                 })
-                agents[agent].transition(State.DECEASED, reason=f"{self.name} critical condition")
+                agent.transition(State.DECEASED, reason=f"{self.name} critical condition")
                 return  # 🚨 agents[agent]e murió, no sigue en la simulación
 
             # 3.2️⃣ RECUPERACIÓN: Puede ser inmune o volver a ser susceptible
             if random.random() < self.recovery_rates.get(severity, 1.0):
-                agents[agent].infection_status.update({
+                status.update({
                     "state": State.RECOVERED,
                     "contagious": False,
                     "severity": None,
                     "days_infected": 0,
                 })
-                agents[agent].transition(State.RECOVERED, reason=f"{self.name} recovery")
+                agent.transition(State.RECOVERED, reason=f"{self.name} recovery")
 
                 # 3.3️⃣ ¿La inmunidad es temporal?
                 if self.immunity_duration > 0:
-                    agents[agent].infection_status["immunity_days"] = self.immunity_duration
+                    status["immunity_days"] = self.immunity_duration
                 else:
-                    agents[agent].infection_status["immunity_days"] = 0
+                    status["immunity_days"] = 0
                 return
 
         # 4️⃣ REINFECCIÓN: Si la inmunidad es temporal, vuelve a ser susceptible
-        if agents[agent].infection_status["state"] == State.RECOVERED and "immunity_days" in agents[agent].infection_status:
-            agents[agent].infection_status["immunity_days"] -= 1
-            if agents[agent].infection_status["immunity_days"] <= 0:
-                agents[agent].infection_status.update({
+        if status["state"] == State.RECOVERED and "immunity_days" in status:
+            status["immunity_days"] -= 1
+            if status["immunity_days"] <= 0:
+                status.update({
                     "state": State.SUSCEPTIBLE,
                     "disease": "",
                     "severity": None,
@@ -387,9 +527,188 @@ class DiseaseModel(ABC):
                     "asymptomatic": None,
                     "immunity_days": 0
                 })
-                agents[agent].transition(State.SUSCEPTIBLE, reason=f"{self.name} immunity waned")
-                agents[agent].immune = False  
+                agent.transition(State.SUSCEPTIBLE, reason=f"{self.name} immunity waned")
+                agent.immune = False  
   
+    def schedule_infection(self, agent, day, calendar):
+        """
+        Schedule the progression of a new infection instead of polling it every day.
+
+        Samples the incubation period now and pushes the end of incubation into the
+        calendar; the outcome and immunity-waning events are scheduled when the previous
+        event is processed. The days match progress_infection called once per day starting
+        on the infection day.
+
+        :param agent: The newly infected agent.
+        :param day: Day of the infection.
+        :param calendar: EventCalendar.
+        """
+        incubation_period = max(round(random.gauss(self.mean_incubation_period[0], self.mean_incubation_period[1])), 0)
+        agent.incubation_period = incubation_period
+        if incubation_period >= 1:
+            agent.infection_status["contagious"] = False
+        calendar.schedule(day + incubation_period, ONSET, agent.agent_id)
+
+    def schedule_infections(self, agents, day, calendar, rng=None):
+        """
+        Schedule the progression of a cohort of new infections (see schedule_infection).
+
+        With a compartment machine the whole cohort enters the initial compartment with one
+        vectorized dwell-time draw.
+
+        :param agents: The newly infected agents.
+        :param day: Day of the infection.
+        :param calendar: EventCalendar.
+        :param rng: numpy.random.Generator (one seeded from ``random`` by default).
+        """
+        if self.compartments is None:
+            for agent in agents:
+                self.schedule_infection(agent, day, calendar)
+        elif agents:
+            rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+            self.compartments.infect(agents, day, calendar, rng, self.name)
+
+    def process_events(self, day, calendar, agents, rng=None):
+        """
+        Apply the events scheduled for ``day``.
+
+        The agents ending incubation and the agents whose infection resolves today are
+        handled as cohorts: severities, outcome days and deaths are drawn with one
+        vectorized call each (determine_severities and the per-severity tables).
+        Events of agents whose state no longer matches (e.g. vaccinated meanwhile) are dropped.
+
+        :param day: Current day.
+        :param calendar: EventCalendar.
+        :param agents: Agent mapping.
+        :param rng: numpy.random.Generator (one seeded from ``random`` by default).
+        :return: Ids of the agents whose infection state changed.
+        """
+        rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        if self.compartments is not None:
+            return self.compartments.process(day, calendar, agents, rng, self.name)
+        changed = []
+        events = calendar.pop(day)
+        while events:
+            cohorts = {ONSET: [], OUTCOME: [], WANING: []}
+            for kind, agent_id in events:
+                agent = agents[agent_id]
+                if agent.state is (State.RECOVERED if kind == WANING else State.INFECTED):
+                    cohorts[kind].append(agent)
+                    changed.append(agent_id)
+            self._end_incubation(cohorts[ONSET], day, calendar, rng)
+            self._resolve_infections(cohorts[OUTCOME], day, calendar, rng)
+            for agent in cohorts[WANING]:
+                self._wane_immunity(agent)
+            events = calendar.pop(day)  # Eventos programados para el mismo día mientras se procesaba
+        return changed
+
+    def determine_severities(self, agents, rng):
+        """
+        Determine the severity of a cohort of agents.
+
+        Subclasses can override it with a vectorized draw; by default determine_severity is
+        called for each agent.
+
+        :param agents: Agents ending incubation with symptoms.
+        :param rng: numpy.random.Generator.
+        :return: Array of severity codes (indices into SEVERITIES).
+        """
+        return np.array([SEVERITIES.index(self.determine_severity(agent)) for agent in agents], dtype=np.int64)
+
+    def _end_incubation(self, cohort, day, calendar, rng):
+        if not cohort:
+            return
+        asymptomatic = np.array([bool(agent.infection_status["asymptomatic"]) for agent in cohort])
+        codes = np.full(len(cohort), ASYMPTOMATIC_CODE, dtype=np.int64)
+        if not asymptomatic.all():
+            codes[~asymptomatic] = self.determine_severities(
+                [agent for agent, flag in zip(cohort, asymptomatic.tolist()) if not flag], rng
+            )
+
+        # progress_infection evalúa la recuperación o muerte una vez por día a partir del día
+        # recovery_days de la infección (y nunca el mismo día del fin de la incubación); los
+        # días hasta que alguna ocurre siguen una distribución geométrica
+        _, resolution = self._outcome_probabilities(codes, cohort)
+        first_check = np.maximum(self.duration_table[codes], 2) - 1
+        resolves = resolution > 0  # Si no, como en progress_infection, la infección no se resuelve nunca
+        waits = np.zeros(len(cohort), dtype=np.int64)
+        waits[resolves] = rng.geometric(np.minimum(resolution[resolves], 1.0))
+        outcome_days = day + first_check + waits - 1
+
+        for agent, code, resolved, outcome_day in zip(cohort, codes.tolist(), resolves.tolist(), outcome_days.tolist()):
+            status = agent.infection_status
+            severity = SEVERITIES[code]
+            status["days_infected"] = agent.incubation_period + 1
+            status["contagious"] = True  # Ya puede contagiar
+            status.update({
+                "severity": severity,
+                "state": State.INFECTED
+            })
+            if severity == "asymptomatic":
+                agent.transition(State.INFECTED, reason=f"{self.name} infection")
+            else:
+                agent.transition(State.INFECTED, reason=f"{self.name} infection ({severity})")
+            if resolved:
+                calendar.schedule(outcome_day, OUTCOME, agent.agent_id)
+
+    def _resolve_infections(self, cohort, day, calendar, rng):
+        if not cohort:
+            return
+        codes = np.array([SEVERITIES.index(agent.infection_status["severity"]) for agent in cohort], dtype=np.int64)
+        mortality, resolution = self._outcome_probabilities(codes, cohort)
+        # Muere con probabilidad mortality / resolution: la parte de las resoluciones que son muertes
+        deaths = rng.random(len(cohort)) * resolution < mortality
+
+        for agent, died in zip(cohort, deaths.tolist()):
+            status = agent.infection_status
+            if died:
+                status.update({
+                    "state": State.DECEASED,
+                    "contagious": False,
+                    "severity": "critical"
+                })
+                agent.transition(State.DECEASED, reason=f"{self.name} critical condition")
+                continue
+
+            status.update({
+                "state": State.RECOVERED,
+                "contagious": False,
+                "severity": None,
+                "days_infected": 0,
+            })
+            agent.transition(State.RECOVERED, reason=f"{self.name} recovery")
+            status["immunity_days"] = self.immunity_duration
+            # Con immunity_duration = 0 no se programa el vencimiento: el ciclo diario nunca
+            # avanzaba a los recuperados, así que quedaban recuperados
+            if self.immunity_duration > 0:
+                calendar.schedule(day + self.immunity_duration, WANING, agent.agent_id)
+
+    def _wane_immunity(self, agent):
+        agent.infection_status.update({
+            "state": State.SUSCEPTIBLE,
+            "disease": "",
+            "severity": None,
+            "contagious": False,
+            "days_infected": 0,
+            "asymptomatic": None,
+            "immunity_days": 0
+        })
+        agent.transition(State.SUSCEPTIBLE, reason=f"{self.name} immunity waned")
+        agent.immune = False
+
+    def _outcome_probabilities(self, codes, cohort):
+        """
+        Daily probabilities of dying and of the infection being resolved (death or recovery)
+        once the recovery period is over, as evaluated by progress_infection.
+
+        :param codes: Severity codes of the cohort.
+        :param cohort: The agents.
+        :return: Tuple of arrays (mortality, resolution).
+        """
+        mortality_rates = np.array([agent.mortality_rate for agent in cohort], dtype=np.float64)
+        mortality = np.where(codes == CRITICAL_CODE, self.calculate_critical_mortality_rate(mortality_rates), 0.0)
+        return mortality, mortality + (1 - mortality) * self.recovery_table[codes]
+
     def calculate_critical_mortality_rate(self, agent_mortality_rate):
         """
         Update the agent's mortality rate based on base mortality and disease mortality rates.
@@ -417,3 +736,25 @@ class DiseaseModel(ABC):
         :return: Severity level ('mild', 'moderate', 'severe', 'critical').
         """
         pass
+
+
+def _transmission_status(agent_ids, agents):
+    """
+    Masks (contagious, susceptible) of the agents, read from the columns of an AgentStore
+    or from each agent. Susceptible excludes immune agents; missing agents are neither.
+    """
+    if isinstance(agents, AgentStore):
+        rows = agent_ids - agents.first_id
+        state = agents.state[rows]
+        return (
+            (state == State.INFECTED.value) & agents.contagious[rows],
+            (state == State.SUSCEPTIBLE.value) & ~agents.immune[rows],
+        )
+    contagious = np.zeros(len(agent_ids), dtype=np.bool_)
+    susceptible = np.zeros(len(agent_ids), dtype=np.bool_)
+    for i, agent_id in enumerate(np.asarray(agent_ids).tolist()):
+        agent = agents[agent_id] if agent_id in agents else None
+        if agent is not None:
+            contagious[i] = agent.state is State.INFECTED and bool(agent.contagious)
+            susceptible[i] = agent.state is State.SUSCEPTIBLE and not agent.immune
+    return contagious, susceptible
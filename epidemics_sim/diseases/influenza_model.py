@@ -1,33 +1,82 @@
+import numpy as np
 from .disease_model import DiseaseModel
-import random
+from .compartments import CompartmentMachine
+from .covid_model import CONFIG_KEYS
+from epidemics_sim.simulation.sampling import AliasTable
+
+SEVERITY_LEVELS = ["mild", "moderate", "severe", "critical"]
+SEVERITY_TABLES = (
+    AliasTable(SEVERITY_LEVELS, [0.7, 0.2, 0.08, 0.02]),
+    AliasTable(SEVERITY_LEVELS, [0.7, 0.2, 0.10, 0.04]),  # Higher risk for agents under 5 or over 65
+)
+VACCINE_FACTOR = 0.6  # Reducción de la transmisión a vacunados
 
 class InfluenzaModel(DiseaseModel):
-    def __init__(self, transmission_rate, recovery_rate, mortality_rate):
+    def __init__(
+        self, transmission_rate, incubation_period, asymptomatic_probability, base_mortality_rate,
+        immunity_duration, recovery_rates, severity_durations, progression_rates, compartments=None
+    ):
         """
         Model specific to Influenza.
 
+        Takes the same parameters as CovidModel (the keys of the disease JSON).
+
         :param transmission_rate: Probability of transmission per contact.
-        :param recovery_rate: Probability of recovery per day.
-        :param mortality_rate: Probability of death if in critical condition.
+        :param incubation_period: (mean, standard deviation) of the incubation period in days.
+        :param asymptomatic_probability: Probability of an agent being asymptomatic.
+        :param base_mortality_rate: Base mortality rate for critical cases.
+        :param immunity_duration: Number of days agents remain immune after recovery (0 = no immunity).
+        :param recovery_rates: Dictionary of recovery rates by severity.
+        :param severity_durations: Dictionary of durations by severity.
+        :param progression_rates: Dictionary of progression rates by severity.
+        :param compartments: Optional CompartmentMachine (see DiseaseModel).
+        """
+        super().__init__(
+            "Influenza",
+            transmission_rate,
+            incubation_period,
+            asymptomatic_probability,
+            base_mortality_rate,
+            immunity_duration,
+            recovery_rates,
+            severity_durations,
+            progression_rates,
+            compartments=compartments,
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create the model from a disease JSON with the same keys as covid.json.
         """
-        super().__init__(transmission_rate, recovery_rate, mortality_rate)
+        compartments = config.get("compartments")
+        return cls(
+            *[config[key] for key in CONFIG_KEYS],
+            compartments=CompartmentMachine(compartments, constants=config) if compartments else None,
+        )
 
-    def calculate_transmission_probability(self, source, target):
+    def calculate_transmission_probability(self, source, target, agents):
         """
         Calculate Influenza specific transmission probability.
 
-        :param source: Source agent.
-        :param target: Target agent.
+        :param source: Source agent ID.
+        :param target: Target agent ID.
         :return: Transmission probability.
         """
         transmission_probability = self.transmission_rate
 
         # Adjust for vaccination status
-        if target.vaccinated:
-            transmission_probability *= 0.6
+        if agents[target].vaccinated:
+            transmission_probability *= VACCINE_FACTOR
 
         return transmission_probability
 
+    def transmission_probabilities(self, sources, targets, agents):
+        """
+        calculate_transmission_probability for arrays of AgentStore rows.
+        """
+        return np.where(agents.vaccinated[targets], self.transmission_rate * VACCINE_FACTOR, self.transmission_rate)
+
     def determine_severity(self, agent):
         """
         Influenza-specific severity determination considering age groups.
@@ -35,12 +84,6 @@ class InfluenzaModel(DiseaseModel):
         :param agent: The agent whose severity is being determined.
         :return: Severity level ('mild', 'moderate', 'severe', 'critical').
         """
-        severity_levels = ["mild", "moderate", "severe", "critical"]
-        probabilities = [0.7, 0.2, 0.08, 0.02]
-
-        # Adjust probabilities for high-risk groups
-        if agent.age < 5 or agent.age > 65:
-            probabilities[2] += 0.02  # Increase severe probability
-            probabilities[3] += 0.02  # Increase critical probability
-
-        return random.choices(severity_levels, probabilities)[0]
+        # High-risk groups have +0.02 severe and +0.02 critical probability
+        high_risk = agent.age < 5 or agent.age > 65
+        return SEVERITY_TABLES[high_risk].sample()
@@ -5,7 +5,10 @@ from jinja2 import Template
 from collections import defaultdict
 import json
 class SimulationAnalyzer:
-    def __init__(self):
+    def __init__(self, scale=1):
+        # Escala de la población simulada (1:scale). Los conteos que recibe record_daily_stats
+        # ya vienen ponderados por el peso de cada agente, es decir, en personas reales.
+        self.scale = scale
         self.daily_stats = []
         self.total_cases = 0
         self.total_deaths = 0
@@ -16,6 +19,8 @@ class SimulationAnalyzer:
         self.municipal_data = {}   # Diccionario para almacenar datos diarios por municipio
 
     def record_daily_stats(self, new_cases, new_deaths, municipality_data):
+        new_cases, new_deaths = round(new_cases), round(new_deaths)
+        municipality_data = {municipality: round(cases) for municipality, cases in municipality_data.items()}
         self.total_cases += new_cases
         self.total_deaths += new_deaths
         self.daily_cases.append(new_cases)
@@ -147,6 +152,7 @@ class SimulationAnalyzer:
             <div class="summary">
                 <p><strong>Casos Acumulados:</strong> {{ total_cases }}</p>
                 <p><strong>Muertes Acumuladas:</strong> {{ total_deaths }}</p>
+                {% if scale != 1 %}<p><strong>Muestra:</strong> 1:{{ scale }} (valores escalados a la población total)</p>{% endif %}
             </div>
             <h2>Casos Acumulados por Municipio</h2>
             {{ municipality_table }}
@@ -164,6 +170,7 @@ class SimulationAnalyzer:
         html_content = template.render(
             total_cases=self.total_cases,
             total_deaths=self.total_deaths,
+            scale=self.scale,
             municipality_table=self.generate_municipality_table()
         )
         with open(filename, "w") as file:
@@ -7,12 +7,12 @@ from epidemics_sim.policies.social_distancing_policy import SocialDistancingPoli
 from epidemics_sim.agents.base_agent import State
 
 class HealthcareSystem:
-    def __init__(self, hospital_capacity, isolation_capacity, policies=[], demografics = {}):
+    def __init__(self, hospital_capacity, isolation_capacity, policies=[], demografics = {}, scale=1):
         self.hospital_capacity = hospital_capacity
         self.isolation_capacity = isolation_capacity
         self.hospitalized = []
         self.isolated = []
-        self.analyzer = SimulationAnalyzer()
+        self.analyzer = SimulationAnalyzer(scale)
         self.policies = policies
         self.active_policies = {policy: False for policy in self.policies}
         self.policy_counters = {policy: 0 for policy in self.policies}
@@ -20,26 +20,38 @@ class HealthcareSystem:
         self.daily_cases = []  # Para almacenar los casos diarios
         self.daily_deaths = []  # Para almacenar las muertes diarias
         self.municipality_data = {mun : 0 for mun in demografics.keys()} 
+        self.reported_deaths = 0  # Muertes acumuladas ya registradas
 
-    def monitor_health_status(self, agents, interactions):
+    def monitor_health_status(self, agents, interactions, counters=None):
         # new_cases = sum(1 for agent in agents if agent.infection_status["state"] == State.INFECTED)
         # new_deaths = sum(1 for agent in agents if agent.infection_status["state"] == State.DECEASED)
         new_cases = 0
         new_deaths = 0
-
-        # Calcular casos por municipio
-        for agent in agents:
-            if agent.infection_status["state"] is State.INFECTED:
-                new_cases += 1
-                municipio = agent.municipio
-                if municipio == "PLAYA":
-                    g=7
-                
-                if municipio not in self.municipality_data:
-                    self.municipality_data[municipio] = 0
-                self.municipality_data[municipio] += 1
-            elif agent.infection_status["state"] is State.DECEASED:
-                new_deaths += 1
+        total_deaths = 0
+
+        if counters is not None:
+            # Con EpidemicCounters no hace falta recorrer la población
+            new_cases = counters.count(State.INFECTED, weighted=True)
+            total_deaths = counters.count(State.DECEASED, weighted=True)
+            new_deaths, self.reported_deaths = total_deaths - self.reported_deaths, total_deaths
+            for municipio, cases in counters.by_municipio(State.INFECTED, weighted=True).items():
+                self.municipality_data[municipio] = self.municipality_data.get(municipio, 0) + cases
+        else:
+            # Calcular casos por municipio; cada agente cuenta por las personas que representa (weight)
+            for agent in agents:
+                if agent.infection_status["state"] is State.INFECTED:
+                    new_cases += agent.weight
+                    municipio = agent.municipio
+                    if municipio == "PLAYA":
+                        g=7
+
+                    if municipio not in self.municipality_data:
+                        self.municipality_data[municipio] = 0
+                    self.municipality_data[municipio] += agent.weight
+                elif agent.infection_status["state"] is State.DECEASED:
+                    total_deaths += agent.weight
+            # Los fallecidos siguen en agents: solo cuentan las muertes nuevas desde ayer
+            new_deaths, self.reported_deaths = total_deaths - self.reported_deaths, total_deaths
         self.analyzer.record_daily_stats(new_cases, new_deaths, self.municipality_data)
         
         self.daily_cases.append(new_cases)
@@ -66,14 +78,18 @@ class HealthcareSystem:
         #         self.isolated.append(agent)
         #         agent.is_isolated, agent.is_hospitalized = True, False
 
-    def evaluate_policies(self, agents, clusters, day):
+    def evaluate_policies(self, agents, clusters, day, counters=None):
         if self.days_since_last_evaluation < 7:
             self.days_since_last_evaluation += 1
             return
 
         self.days_since_last_evaluation = 0
-        total_population = len(agents)
-        total_infected = sum(1 for agent in agents if agent.infection_status["state"] is State.INFECTED)
+        if counters is not None:
+            total_population = counters.total() - counters.count(State.DECEASED)
+            total_infected = counters.count(State.INFECTED)
+        else:
+            total_population = sum(1 for agent in agents if agent.infection_status["state"] is not State.DECEASED)
+            total_infected = sum(1 for agent in agents if agent.infection_status["state"] is State.INFECTED)
         infection_rate = total_infected / total_population if total_population > 0 else 0
         hospital_occupancy = len(self.hospitalized) / self.hospital_capacity
         hospitalized = len(self.hospitalized)
@@ -138,8 +154,8 @@ class HealthcareSystem:
                 print(f"🛑 {policy_type.__name__} eliminada.")
 
     
-    def daily_operations(self, agents, clusters, interactions, day):
-        self.monitor_health_status(agents, interactions)
+    def daily_operations(self, agents, clusters, interactions, day, counters=None):
+        self.monitor_health_status(agents, interactions, counters)
 
         # 📌 Verificar si la política de vacunación está activa y continuar vacunando progresivamente
         if self.active_policies.get(VaccinationPolicy, False):
@@ -149,4 +165,4 @@ class HealthcareSystem:
                     if total_vaccination :
                         self.remove_policies(agents,clusters, VaccinationPolicy)
                         
-        self.evaluate_policies(agents, clusters, day)
+        self.evaluate_policies(agents, clusters, day, counters)
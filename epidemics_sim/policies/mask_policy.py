@@ -1,4 +1,5 @@
 from epidemics_sim.policies.base_policy import Policy
+from epidemics_sim.agents.agent_store import store_of
 
 class MaskUsagePolicy(Policy):
     def __init__(self, transmission_reduction_factor=0.7):
@@ -11,14 +12,23 @@ class MaskUsagePolicy(Policy):
         """
         Reduce la probabilidad de transmisión de la enfermedad mediante el uso de mascarillas.
         """
+        store = store_of(agents)
+        if store is not None:
+            # Toda la población de una vez; se recalculan los multiplicadores de transmisión
+            store.set_masks(slice(None), True, self.transmission_reduction_factor)
+            return
         for agent in agents:
             agent.mask["usage"] = True
-            agent.mask["reduction_factor"] = 0.7
+            agent.mask["reduction_factor"] = self.transmission_reduction_factor
 
     def delete(self, agents, clusters):
         """
         Restaura la probabilidad de transmisión a su valor original eliminando la política de mascarillas.
         """
+        store = store_of(agents)
+        if store is not None:
+            store.set_masks(slice(None), False, 1.0)
+            return
         for agent in agents:
             agent.mask["usage"] = False
             agent.mask["reduction_factor"] = 1.0
@@ -1,5 +1,7 @@
 import random
+import numpy as np
 from epidemics_sim.policies.base_policy import Policy
+from epidemics_sim.agents.agent_store import store_of
 from epidemics_sim.agents.base_agent import State
 
 class VaccinationPolicy(Policy):
@@ -19,7 +21,11 @@ class VaccinationPolicy(Policy):
         :param agents: Diccionario de agentes en la simulación.
         :param clusters: Diccionario de clusters en la simulación.
         """
-        unvaccinated_agents = [agent for agent in agents if not agent.infection_status["state"] is not State.Infected and  agent.vaccinated and agent.agent_id not in self.vaccinated_agents]
+        store = store_of(agents)
+        if store is not None:
+            return self._vaccinate_store(store)
+
+        unvaccinated_agents = [agent for agent in agents if agent.infection_status["state"] not in (State.INFECTED, State.DECEASED) and not agent.vaccinated and agent.agent_id not in self.vaccinated_agents]
 
         if not unvaccinated_agents:
             print("✅ Todos los agentes elegibles han sido vacunados.")
@@ -37,6 +43,25 @@ class VaccinationPolicy(Policy):
 
         return False    
 
+    def _vaccinate_store(self, store):
+        """
+        enforce sobre un AgentStore: elige y vacuna a la cohorte del día con operaciones sobre columnas.
+        """
+        eligible = np.flatnonzero(
+            (store.state != State.INFECTED.value) & (store.state != State.DECEASED.value) & ~store.vaccinated
+        )
+        if len(eligible) == 0:
+            print("✅ Todos los agentes elegibles han sido vacunados.")
+            return True
+
+        num_to_vaccinate = max(1, int(len(eligible) * self.vaccination_rate))
+        rng = np.random.default_rng(random.getrandbits(64))
+        rows = np.sort(rng.choice(eligible, num_to_vaccinate, replace=False))
+        store.vaccinate(rows, self.vaccine_efficacy)  # Actualiza también la susceptibilidad en caché
+        self.vaccinated_agents.update((rows + store.first_id).tolist())
+        print(f"💉 {num_to_vaccinate} agentes vacunados con efectividad {self.vaccine_efficacy * 100:.1f}%.")
+        return False
+
     def delete(self, agents, clusters):
         """
         Elimina la política de vacunación. **Nota:** No revierte las vacunas aplicadas.
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from epidemics_sim.simulation.snapshot import MANIFEST, CLUSTERS_MANIFEST
+
+# Se incluye en la clave de la caché: incrementarlo cada vez que cambie la forma en que
+# se generan la población o los clusters, para no reutilizar artefactos obsoletos.
+GENERATOR_VERSION = 7
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "epidemics_sim")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+
+class ArtifactCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Caché local de poblaciones y estructuras de contacto ya generadas.
+
+        Cada entrada es un directorio de snapshot (ver simulation/snapshot.py) cuyo nombre es
+        el hash de los datos demográficos, la versión del generador y la semilla. Cuando el
+        tamaño total supera ``max_bytes`` se eliminan las entradas usadas hace más tiempo (LRU).
+
+        :param directory: Directorio raíz de la caché.
+        :param max_bytes: Tamaño máximo de la caché en bytes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, demographics, seed, **options):
+        """
+        Clave de contenido para una configuración.
+
+        :param demographics: Diccionario con datos demográficos.
+        :param seed: Semilla usada para generar la población y los clusters.
+        :param options: Otras opciones que cambian el resultado de la generación.
+        :return: Hash SHA-256 en hexadecimal.
+        """
+        payload = json.dumps(
+            {"demographics": demographics, "generator_version": GENERATOR_VERSION, "seed": seed, "options": options},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def contains(self, key):
+        path = self.path(key)
+        return os.path.exists(os.path.join(path, MANIFEST)) and os.path.exists(os.path.join(path, CLUSTERS_MANIFEST))
+
+    def get(self, key):
+        """
+        Devuelve el directorio de la entrada y la marca como usada, o None si no existe.
+        """
+        if not self.contains(key):
+            return None
+        os.utime(self.path(key))
+        return self.path(key)
+
+    def put(self, key, writer):
+        """
+        Crea una entrada llamando a ``writer(directorio)`` y la publica de forma atómica.
+
+        :param key: Clave de la entrada.
+        :param writer: Función que escribe el snapshot en el directorio que recibe.
+        :return: Directorio de la entrada.
+        """
+        staging = tempfile.mkdtemp(prefix=f".{key}.", dir=self.directory)
+        try:
+            writer(staging)
+            if os.path.exists(self.path(key)):
+                shutil.rmtree(self.path(key))
+            os.replace(staging, self.path(key))
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+        self.evict(keep=key)
+        return self.path(key)
+
+    def evict(self, keep=None):
+        """
+        Elimina las entradas menos usadas recientemente hasta quedar por debajo de max_bytes.
+
+        :param keep: Clave que no debe eliminarse (la que se acaba de escribir).
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), _directory_size(path), name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self.path(name), ignore_errors=True)
+            total -= size
+
+
+def _directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
@@ -1,76 +1,122 @@
 import random
+import numpy as np
 import networkx as nx
 from epidemics_sim.agents.base_agent import State
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.simulation.demographic_index import DemographicIndex
+from epidemics_sim.simulation.contact_graphs import barabasi_albert_edges, geometric_edge_sample
+
+# Aristas que agrega cada nodo nuevo en las topologías libres de escala
+SCALE_FREE_M = 2
+
+# Con edge_sampler="auto" se usan saltos geométricos por debajo de esta probabilidad de interacción
+GEOMETRIC_SAMPLING_THRESHOLD = 0.2
 
 class Subcluster:
-    def __init__(self, agents,cluster, topology="scale_free"):
+    def __init__(self, agents,cluster, topology="scale_free", edges=None):
         """
-        Inicializa un subcluster con un grafo estático y probabilidad de interacción ajustable.
-        
+        Inicializa un subcluster con una estructura de contactos estática.
+
+        Las aristas se generan una sola vez; al compilar el cluster (ClusterWithSubclusters.build_edges)
+        pasan al arreglo de aristas compartido del tipo de cluster y el subcluster solo guarda su
+        posición en él. El grafo de networkx se construye bajo demanda (``graph``), por ejemplo
+        para GraphValidator.
+
         :param agents: Lista de agentes en el subcluster.
-        :param topology: Topología del grafo ("scale_free" o "complete").
-        :param interaction_probability: Probabilidad de que una conexión en el grafo genere una interacción.
+        :param topology: Topología del grafo: "scale_free" (networkx, un grafo por subcluster),
+                         "scale_free_batch" (mismo modelo, generado junto con los demás subclusters
+                         del cluster en build_edges), "complete" o "complete_implicit" (todos
+                         contra todos sin guardar aristas: solo cuenta la pertenencia; cada día
+                         se sortean sus pares igual que las aristas de "complete").
+        :param edges: Aristas ya generadas (pares de índices locales), por ejemplo desde la caché.
         """
         self.agents = agents
         self.topology = topology
         self.cluster = cluster
-        self.graph = self.generate_graph()  # Se genera una vez y no se vuelve a calcular en cada paso
+        self.index = None  # Posición en cluster.subclusters una vez compiladas las aristas
+        self._local_edges = self.generate_edges(edges)
 
-    def generate_graph(self):
+    def generate_edges(self, edges=None):
         """
-        Genera un grafo basado en la topología especificada.
+        Genera las aristas según la topología especificada.
+
+        :param edges: Si se indica, se usan estas aristas en lugar de generarlas.
+        :return: Arreglo int32 (k, 2) de pares de índices locales (posiciones en ``agents``).
         """
         num_agents = len(self.agents)
-        # if num_agents < 2:
-        #     return nx.Graph()
-
+        if edges is not None:
+            return np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        if self.topology == "scale_free_batch":
+            return None  # Pendiente: se genera en bloque en ClusterWithSubclusters.build_edges
         if self.topology == "scale_free":
-            m = max(1, min(2, num_agents - 1))
-            graph = nx.barabasi_albert_graph(num_agents, m)
-        elif self.topology == "complete":
-            graph = nx.complete_graph(num_agents)
-        else:
-            raise ValueError(f"Unknown topology: {self.topology}")
-
-        for i, agent in enumerate(self.agents):
-            graph.nodes[i]["agent"] = agent
-
+            if num_agents < 2:
+                return np.zeros((0, 2), dtype=np.int32)
+            m = max(1, min(SCALE_FREE_M, num_agents - 1))
+            return np.array(nx.barabasi_albert_graph(num_agents, m).edges, dtype=np.int32).reshape(-1, 2)
+        if self.topology == "complete":
+            return np.column_stack(np.triu_indices(num_agents, 1)).astype(np.int32)
+        if self.topology == "complete_implicit":
+            return np.zeros((0, 2), dtype=np.int32)  # Las aristas se deducen de la pertenencia
+        raise ValueError(f"Unknown topology: {self.topology}")
+
+    @property
+    def edges(self):
+        """
+        Aristas del subcluster como pares de IDs de agentes (arreglo int32 (k, 2)).
+        """
+        if self.index is None:
+            ids = np.array([agent.agent_id for agent in self.agents], dtype=np.int32)
+            return ids[self.local_edges]
+        start, stop = self.cluster.edge_offsets[self.index], self.cluster.edge_offsets[self.index + 1]
+        return np.column_stack((self.cluster.sources[start:stop], self.cluster.targets[start:stop]))
+
+    @property
+    def local_edges(self):
+        """
+        Aristas del subcluster como pares de índices locales (posiciones en ``agents``).
+        """
+        if self.index is None:
+            if self._local_edges is None:
+                # Subcluster "scale_free_batch" usado antes de compilar el cluster: lote de uno
+                self._local_edges = barabasi_albert_edges([len(self.agents)], SCALE_FREE_M, _rng())[1]
+            return self._local_edges
+        positions = {agent.agent_id: i for i, agent in enumerate(self.agents)}
+        return np.array([[positions[a], positions[b]] for a, b in self.edges.tolist()], dtype=np.int32).reshape(-1, 2)
+
+    @property
+    def graph(self):
+        """
+        Grafo de networkx del subcluster, construido en cada acceso a partir de las aristas.
+        Los nodos son índices locales y guardan el agente en ``graph.nodes[i]["agent"]``.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from((i, {"agent": agent}) for i, agent in enumerate(self.agents))
+        graph.add_edges_from(self.local_pairs().tolist())
         return graph
 
+    def local_pairs(self):
+        """
+        Todos los pares en contacto (índices locales), incluidos los de la topología implícita.
+        """
+        if self.topology == "complete_implicit":
+            return np.column_stack(np.triu_indices(len(self.agents), 1)).astype(np.int32)
+        return self.local_edges
+
     def remove_agent(self, agent):
         """
-        Elimina un agente del grafo cuando fallece para evitar futuras interacciones.
+        Elimina las aristas de un agente cuando fallece para evitar futuras interacciones.
         """
-        for node in list(self.graph.nodes):
-            if self.graph.nodes[node]["agent"] == agent:
-                self.graph.remove_node(node)
-                break
+        self.cluster.remove_agents([agent.agent_id])
 
     def simulate_interactions(self, agents):
         """
         Simula interacciones dentro del subcluster basándose en la probabilidad de interacción.
         """
+        ids = np.array([agent.agent_id for agent in self.agents], dtype=np.int32)
         interactions = []
-        for edge in list(self.graph.edges):
-            agent1 = self.graph.nodes[edge[0]]['agent']
-            agent2 = self.graph.nodes[edge[1]]['agent']
-            
-            # Evitar interacciones con agentes fallecidos
-            # if self.cluster.cluster_type == "shopping":
-            #     if agents[agent1.agent_id].infection_status['state'] == State.DECEASED or agents[agent1.agent_id].is_hospitalized or agents[agent1.agent_id].is_isolated:
-            #         self.update_shopping_agents(agent1)
-            #     elif agents[agent2.agent_id].infection_status['state'] == State.DECEASED or agents[agent2.agent_id].is_hospitalized or agents[agent2.agent_id].is_isolated:
-            #         self.update_shopping_agents(agent2)
-            #     continue    
-            # if agents[agent1.agent_id].infection_status["state"] == State.DECEASED or agents[agent2.agent_id].infection_status["state"] == State.DECEASED:
-            #     continue
-
-            # if agents[agent1.agent_id].is_hospitalized or agents[agent2.agent_id].is_hospitalized or agents[agent1.agent_id].is_isolated or agents[agent2.agent_id].is_isolated:
-            #     continue
-
+        for agent1, agent2 in ids[self.local_pairs()].tolist():
             if random.random() < self.cluster.interaction_probability:
-                interactions.append((agent1.agent_id, agent2.agent_id))
-        
+                interactions.append((agent1, agent2))
         return interactions
     
     def adjust_interaction_probability(self, new_probability):
@@ -83,8 +129,7 @@ class Subcluster:
         """
         Actualiza la lista de compradores si un agente fallece, está hospitalizado o aislado.
         """
-        household_id = agent.household_id
-        household_members = [member for member in agent.hosehold if member.agent_id != agent.agent_id]
+        household_members = [member for member in agent.household if member.agent_id != agent.agent_id]
         best_candidate = None
         best_age = -1  # Almacena la mejor edad encontrada
 
@@ -101,36 +146,134 @@ class Subcluster:
                 best_candidate = member
                 best_age = member.age
 
-        # Remover el agente del grafo
-        for node in list(self.graph.nodes):
-            if self.graph.nodes[node]["agent"] == agent:
-                self.graph.remove_node(node)
-                break
+        # Remover las aristas del agente
+        self.remove_agent(agent)
 
         # Si se encontró un nuevo representante, actualizar el cluster
         if best_candidate and best_age >= 12:
             self.agents.append(best_candidate)  # Agregar al nuevo representante
-            self.graph = self.generate_graph()  # Regenerar el grafo con el nuevo agente
-            # new_node = len(self.graph.nodes)  # Nuevo índice de nodo en el grafo
-            # self.graph.add_node(new_node, agent=best_candidate)
-
-            # Conectar con vecinos existentes en la red de compras
-            # for neighbor in self.graph.nodes:
-            #     if random.random() < 0.5:  # Probabilidad arbitraria de reconectar
-            #         self.graph.add_edge(new_node, neighbor)
+            self._local_edges = self.generate_edges()  # Regenerar las aristas con el nuevo agente
+            self.index = None
+            self.cluster.build_edges()
 
 
 
 class ClusterWithSubclusters:
-    def __init__(self, subclusters, cluster_type, active_periods ,interaction_probability):
+    def __init__(self, subclusters, cluster_type, active_periods ,interaction_probability, edge_sampler="auto"):
         """
         Agrupa varios subclusters dentro de un tipo de cluster (hogares, trabajo, etc.).
+
+        ``edge_sampler`` elige cómo se sortean cada día las aristas que se realizan:
+        "bernoulli" (un número aleatorio por arista), "geometric" (saltos geométricos hasta
+        la siguiente arista realizada, el costo depende solo de las realizadas) o "auto"
+        (geometric cuando interaction_probability < GEOMETRIC_SAMPLING_THRESHOLD).
+
+        Las aristas de todos los subclusters se guardan juntas en formato comprimido:
+        ``sources`` y ``targets`` son IDs de agentes (int32) y las aristas del subcluster i
+        van de ``edge_offsets[i]`` a ``edge_offsets[i + 1]``. Los subclusters "complete_implicit"
+        no tienen aristas: solo se guardan sus miembros en ``implicit_offsets``/``implicit_members``.
         """
         self.subclusters = subclusters
         self.cluster_type = cluster_type
         self.active_periods = active_periods
         self.lockdown_is_active = False
         self.interaction_probability = interaction_probability
+        self.edge_sampler = edge_sampler
+        self.edge_offsets = np.zeros(1, dtype=np.int64)
+        self.sources = np.zeros(0, dtype=np.int32)
+        self.targets = np.zeros(0, dtype=np.int32)
+        self.implicit_offsets = np.zeros(1, dtype=np.int64)
+        self.implicit_members = np.zeros(0, dtype=np.int32)
+        self.implicit_present = np.zeros(0, dtype=np.bool_)  # False = agente eliminado (fallecido)
+        self.alive = None  # Máscara por ID de agente de los vivos (InfectionFrontier.alive); None = todos
+        self.interaction_count = 0  # Contactos del último simulate_interactions, incluidos los implícitos
+        self._memberships = None
+        self._adjacency = None
+
+    def build_edges(self):
+        """
+        Compila las aristas de los subclusters en los arreglos compartidos del cluster.
+        Se llama al terminar de generar (o cargar) los subclusters.
+        """
+        pending = [s for s in self.subclusters if s.index is None and s._local_edges is None]
+        if pending:
+            offsets, local_edges = barabasi_albert_edges([len(s.agents) for s in pending], SCALE_FREE_M, _rng())
+            for subcluster, start, stop in zip(pending, offsets[:-1], offsets[1:]):
+                subcluster._local_edges = local_edges[start:stop]
+
+        edges = [subcluster.edges for subcluster in self.subclusters]
+        edge_offsets = np.concatenate(([0], np.cumsum([len(e) for e in edges], dtype=np.int64)))
+        edges = np.concatenate(edges) if edges else np.zeros((0, 2), dtype=np.int32)
+        self.set_edges(edge_offsets, edges[:, 0], edges[:, 1])
+
+    def set_edges(self, edge_offsets, sources, targets):
+        """
+        Usa arreglos de aristas ya compilados (por ejemplo leídos de un snapshot).
+        """
+        self.edge_offsets = np.asarray(edge_offsets, dtype=np.int64)
+        self.sources = np.ascontiguousarray(sources, dtype=np.int32)
+        self.targets = np.ascontiguousarray(targets, dtype=np.int32)
+        self._adjacency = None
+        for index, subcluster in enumerate(self.subclusters):
+            subcluster.index = index
+            subcluster._local_edges = None
+
+        implicit = [subcluster.agents for subcluster in self.subclusters if subcluster.topology == "complete_implicit"]
+        self.implicit_offsets = np.concatenate(([0], np.cumsum([len(agents) for agents in implicit], dtype=np.int64)))
+        self.implicit_members = np.array([agent.agent_id for agents in implicit for agent in agents], dtype=np.int32)
+        self.implicit_present = np.ones(len(self.implicit_members), dtype=np.bool_)
+
+    def remove_agents(self, agent_ids):
+        """
+        Elimina todas las aristas de los agentes indicados.
+
+        Recorre todas las aristas, así que conviene llamarlo con lotes de agentes; mientras
+        tanto la máscara ``alive`` ya deja fuera de las interacciones a los fallecidos.
+        """
+        self.implicit_present &= ~np.isin(self.implicit_members, agent_ids)
+        removed = np.isin(self.sources, agent_ids) | np.isin(self.targets, agent_ids)
+        if not removed.any():
+            return
+        subcluster_of_edge = np.repeat(np.arange(len(self.subclusters)), np.diff(self.edge_offsets))
+        kept = np.bincount(subcluster_of_edge[~removed], minlength=len(self.subclusters))
+        self.edge_offsets = np.concatenate(([0], np.cumsum(kept, dtype=np.int64)))
+        self.sources = self.sources[~removed]
+        self.targets = self.targets[~removed]
+        self._adjacency = None
+
+    def graph(self):
+        """
+        Grafo de networkx de todo el tipo de cluster, con los IDs de los agentes como nodos.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(agent.agent_id for subcluster in self.subclusters for agent in subcluster.agents)
+        graph.add_edges_from(zip(self.sources.tolist(), self.targets.tolist()))
+        for start, stop in zip(self.implicit_offsets[:-1].tolist(), self.implicit_offsets[1:].tolist()):
+            members = self.implicit_members[start:stop]
+            graph.add_edges_from(members[self.implicit_pairs(stop - start)].tolist())
+        return graph
+
+    @staticmethod
+    def implicit_pairs(size):
+        return np.column_stack(np.triu_indices(size, 1))
+
+    def num_edges(self):
+        return len(self.sources)
+
+    def memberships(self):
+        """
+        Pertenencia a los subclusters como (offsets, members): los IDs de los agentes del
+        subcluster i son ``members[offsets[i]:offsets[i + 1]]``.
+        """
+        if self._memberships is None or len(self._memberships[0]) != len(self.subclusters) + 1:
+            sizes = [len(subcluster.agents) for subcluster in self.subclusters]
+            members = [agent.agent_id for subcluster in self.subclusters for agent in subcluster.agents]
+            offsets = np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+            self._memberships = (offsets, np.asarray(members, dtype=np.int64))
+        return self._memberships
+
+    def set_memberships(self, offsets, members):
+        self._memberships = (np.asarray(offsets, dtype=np.int64), np.asarray(members, dtype=np.int64))
 
     def enforce_lockdown(self):
         self.lockdown_is_active = True
@@ -142,11 +285,209 @@ class ClusterWithSubclusters:
         """
         Simula interacciones en todos los subclusters durante un período activo.
         """
-        interactions = []
-        if not self.lockdown_is_active and time_period in self.active_periods:
-            for subcluster in self.subclusters:
-                interactions.extend(subcluster.simulate_interactions(agents))
+        if self.lockdown_is_active or time_period not in self.active_periods:
+            self.interaction_count = 0
+            return []
+        rng = _rng()
+        selected = self.sample_edges(rng)
+        sources, targets = self.sources[selected], self.targets[selected]
+        if self.alive is not None:
+            living = self.alive[sources] & self.alive[targets]
+            sources, targets = sources[living], targets[living]
+        interactions = list(zip(sources.tolist(), targets.tolist()))
+        self.interaction_count = len(interactions)
+        if len(self.implicit_members):
+            # Todos los pares realizados, no solo los de miembros contagiosos: propagate encadena
+            # contagios dentro del hogar en el mismo día (un miembro recién infectado contagia a otro)
+            everyone = np.ones(len(self.implicit_members), dtype=np.bool_)
+            sources, targets, _, _ = self._implicit_interactions(everyone, rng)
+            self.interaction_count += len(sources)
+            interactions.extend(zip(sources.tolist(), targets.tolist()))
         return interactions
+
+    def adjacency(self):
+        """
+        Índice por agente de las aristas incidentes: las aristas del agente con ID a son
+        ``edge_ids[agent_offsets[a]:agent_offsets[a + 1]]`` (posiciones en sources/targets).
+
+        :return: Tupla (agent_offsets, edge_ids); se construye una vez y se reutiliza.
+        """
+        if self._adjacency is None:
+            num_edges = len(self.sources)
+            endpoints = np.concatenate((self.sources, self.targets)).astype(np.int64)
+            edge_ids = np.concatenate((np.arange(num_edges), np.arange(num_edges)))
+            size = int(endpoints.max()) + 1 if num_edges else 0
+            order = np.argsort(endpoints, kind="stable")
+            agent_offsets = np.concatenate(([0], np.cumsum(np.bincount(endpoints, minlength=size))))
+            self._adjacency = (agent_offsets, edge_ids[order])
+        return self._adjacency
+
+    def contagious_contacts(self, time_period, contagious_ids, rng, spread=None):
+        """
+        Contactos del día que pueden transmitir, sin muestrear el resto de las aristas.
+
+        Con el índice por agente se toman solo las aristas incidentes a agentes contagiosos
+        (cada una una vez) y se sortea cuáles se realizan; las demás aristas solo se cuentan,
+        con una binomial, para interaction_count. Los subclusters implícitos se tratan igual.
+
+        Con ``spread`` los contagios se encadenan dentro del cluster como en propagate: se
+        llama con los contactos de cada ronda, ``spread(sources, targets, order)``, y devuelve
+        los IDs de los agentes infectados hasta ese momento en el cluster; en la ronda
+        siguiente se sortean las aristas de los recién infectados que todavía no se habían
+        sorteado, hasta que no haya nuevos infectados. ``order`` es la posición de cada
+        contacto dirigido en la lista que devolvería simulate_interactions (2 * posición del
+        par, + 1 si va en sentido inverso al par), y ``order ^ 1`` la del sentido contrario.
+
+        :param time_period: Período del día.
+        :param contagious_ids: IDs (ordenados) de los agentes contagiosos al empezar el día.
+        :param rng: numpy.random.Generator.
+        :param spread: Función que evalúa la transmisión de cada ronda (ver arriba); sin ella
+                       se hace una sola ronda con los contagiosos.
+        :return: (sources, targets): arreglos de IDs de los contactos realizados, con el agente
+                 contagioso (o infectado en el cluster) en sources.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        self.interaction_count = 0
+        if self.lockdown_is_active or time_period not in self.active_periods:
+            return empty, empty
+
+        frontier = np.unique(np.asarray(contagious_ids, dtype=np.int64))
+        explored = empty
+        sources, targets = [empty], [empty]
+        candidates = 0
+        while len(frontier):
+            round_sources, round_targets, order, sampled = self._incident_contacts(frontier, explored, rng)
+            sources.append(round_sources)
+            targets.append(round_targets)
+            candidates += sampled
+            explored = np.union1d(explored, frontier)
+            if spread is None:
+                break
+            frontier = np.setdiff1d(spread(round_sources, round_targets, order), explored)
+
+        sources, targets = np.concatenate(sources), np.concatenate(targets)
+        self.interaction_count = len(sources) + int(
+            rng.binomial(self._living_edge_count() + self._implicit_pair_count() - candidates, self.interaction_probability)
+        )
+        return sources, targets
+
+    def _incident_contacts(self, frontier, explored, rng):
+        """
+        Sortea las aristas incidentes a ``frontier`` que no tocan a agentes de ``explored``
+        (esas ya se sortearon en una ronda anterior).
+
+        :return: (sources, targets, order, candidates): contactos realizados con el agente de
+                 frontier en sources, su posición dirigida (ver contagious_contacts) y la
+                 cantidad de pares sorteados.
+        """
+        agent_offsets, edge_ids = self.adjacency()
+        ids = frontier[frontier < len(agent_offsets) - 1]
+        counts = agent_offsets[ids + 1] - agent_offsets[ids]
+        starts = np.repeat(agent_offsets[ids] - (np.cumsum(counts) - counts), counts)
+        incident = np.unique(edge_ids[starts + np.arange(counts.sum())])
+        if len(explored):
+            incident = incident[~(np.isin(self.sources[incident], explored) | np.isin(self.targets[incident], explored))]
+        if self.alive is not None:
+            # Las aristas con un fallecido no se sortean ni cuentan, como en simulate_interactions
+            incident = incident[self.alive[self.sources[incident]] & self.alive[self.targets[incident]]]
+        realized = incident[self.sample_edges(rng, len(incident))]
+
+        first, second = self.sources[realized].astype(np.int64), self.targets[realized].astype(np.int64)
+        forward = np.isin(first, frontier)
+        sources, targets = np.where(forward, first, second), np.where(forward, second, first)
+        order = 2 * realized.astype(np.int64) + ~forward
+        candidates = len(incident)
+
+        if len(self.implicit_members):
+            marked = np.isin(self.implicit_members, frontier)
+            implicit_sources, implicit_targets, implicit_order, implicit_candidates = self._implicit_interactions(
+                marked, rng, explored=np.isin(self.implicit_members, explored)
+            )
+            sources = np.concatenate((sources, implicit_sources))
+            targets = np.concatenate((targets, implicit_targets))
+            order = np.concatenate((order, implicit_order))
+            candidates += implicit_candidates
+        return sources, targets, order, candidates
+
+    def _living_edge_count(self):
+        if self.alive is None:
+            return len(self.sources)
+        return int((self.alive[self.sources] & self.alive[self.targets]).sum())
+
+    def _implicit_pair_count(self):
+        present = self.implicit_present if self.alive is None else self.implicit_present & self.alive[self.implicit_members]
+        sizes = np.diff(self.implicit_offsets)
+        present_sizes = np.bincount(np.repeat(np.arange(len(sizes)), sizes)[present], minlength=len(sizes))
+        return int((present_sizes * (present_sizes - 1) // 2).sum())
+
+    def sample_edges(self, rng, num_edges=None):
+        """
+        Índices (o máscara) de las aristas que se realizan hoy, según edge_sampler.
+
+        :param num_edges: Cantidad de aristas candidatas (por defecto todas las del cluster).
+        """
+        num_edges = len(self.sources) if num_edges is None else num_edges
+        probability = self.interaction_probability
+        sampler = self.edge_sampler
+        if sampler == "auto":
+            sampler = "geometric" if probability < GEOMETRIC_SAMPLING_THRESHOLD else "bernoulli"
+        if sampler == "geometric":
+            return geometric_edge_sample(num_edges, probability, rng)
+        if sampler == "bernoulli":
+            # Un sorteo vectorizado sobre todas las aristas
+            return rng.random(num_edges) < probability
+        raise ValueError(f"Unknown edge sampler: {self.edge_sampler}")
+
+    def _implicit_interactions(self, contagious, rng, explored=None):
+        """
+        Contactos de los subclusters "complete_implicit" sin guardar sus aristas.
+
+        Se sortean los pares de cada miembro marcado con los demás miembros de su subcluster
+        (cada par una sola vez, en orden lexicográfico de posiciones). simulate_interactions
+        marca a todos los miembros; contagious_contacts solo a los contagiosos (o recién
+        infectados), y el resto de los pares solo se cuenta con una binomial.
+
+        :param contagious: Máscara de los miembros (implicit_members) cuyos pares se sortean.
+        :param explored: Máscara de los miembros cuyos pares ya se sortearon (se omiten).
+        :return: (sources, targets, order, candidates): IDs de los pares realizados, con el
+                 miembro marcado en sources; su posición dirigida después de las aristas
+                 explícitas (ver contagious_contacts) y la cantidad de pares sorteados.
+        """
+        probability = self.interaction_probability
+        members, present = self.implicit_members, self.implicit_present
+        if self.alive is not None:
+            present = present & self.alive[members]
+        if explored is not None:
+            present = present & ~explored
+        sizes = np.diff(self.implicit_offsets)
+        subcluster = np.repeat(np.arange(len(sizes)), sizes)
+        contagious = present & contagious
+
+        sources = np.flatnonzero(contagious)
+        candidates = sizes[subcluster[sources]]
+        source_slot = np.repeat(sources, candidates)
+        first = np.repeat(self.implicit_offsets[subcluster[sources]], candidates)
+        partner_slot = first + np.arange(candidates.sum()) - np.repeat(np.cumsum(candidates) - candidates, candidates)
+        # Sin el propio agente, sin eliminados y con los pares entre dos marcados contados una vez
+        keep = (
+            (partner_slot != source_slot) & present[partner_slot]
+            & (~contagious[partner_slot] | (partner_slot > source_slot))
+        )
+        source_slot, partner_slot = source_slot[keep], partner_slot[keep]
+        realized = rng.random(len(source_slot)) < probability
+        sampled = len(source_slot)
+        source_slot, partner_slot = source_slot[realized], partner_slot[realized]
+
+        # Posición del par (i, j), i < j, en el orden lexicográfico de todos los pares implícitos
+        low, high = np.minimum(source_slot, partner_slot), np.maximum(source_slot, partner_slot)
+        later_partners = self.implicit_offsets[subcluster + 1] - np.arange(len(members)) - 1
+        pair_start = np.cumsum(later_partners) - later_partners
+        pair = len(self.sources) + pair_start[low] + (high - low - 1)
+        order = 2 * pair + (source_slot > partner_slot)
+        return (
+            members[source_slot].astype(np.int64), members[partner_slot].astype(np.int64),
+            order.astype(np.int64), sampled
+        )
     
     def adjust_interaction_probability(self, new_probability):
         """
@@ -165,18 +506,46 @@ class ClusterWithSubclusters:
         """
         Elimina agentes fallecidos de todos los subclusters del cluster.
         """
-        for subcluster in self.subclusters:
-            for agent in deceased_agents:
-                subcluster.remove_agent(agent)
+        self.remove_agents([agent.agent_id for agent in deceased_agents])
+
+def _rng():
+    # La semilla sale del módulo random para que random.seed siga fijando la simulación completa
+    return np.random.default_rng(random.getrandbits(64))
+
 
 class CityClusterGenerator:
-    def __init__(self, municipal_data):
+    def __init__(self, municipal_data, scale=1, topology="scale_free_batch"):
+        """
+        :param municipal_data: Diccionario con datos demográficos.
+        :param topology: Topología de los subclusters de trabajo, escuela y tiendas (ver Subcluster).
+        :param scale: Escala de la población muestreada (ver SyntheticPopulationGenerator).
+                      El número de empresas, tiendas y escuelas se divide entre ``scale``;
+                      el tamaño de los hogares no cambia, así que la cantidad de hogares
+                      (población / promedio por hogar) queda escalada por sí sola.
+        """
         self.data = municipal_data
-        self.total_companies = municipal_data["total_empresas"]
-        self.total_stores = municipal_data["total_tiendas"]
+        self.scale = scale
+        self.topology = topology
+        self.total_companies = self._scaled(municipal_data["total_empresas"])
+        self.total_stores = self._scaled(municipal_data["total_tiendas"])
         self.municipal_data = municipal_data["municipios"]
+
+    def _scaled(self, count):
+        count = int(count)
+        return max(1, round(count / self.scale)) if count > 0 else 0
     
+    def index(self, agents):
+        """
+        Índice demográfico compartido por los generadores; si ``agents`` ya es un
+        DemographicIndex se devuelve tal cual.
+        """
+        if isinstance(agents, DemographicIndex):
+            return agents
+        return DemographicIndex(agents, self.municipal_data.keys())
+
     def generate_clusters(self, agents):
+        # Una sola pasada sobre la población; todos los generadores usan el mismo índice
+        agents = self.index(agents)
         return {
             "home": self.generate_home_clusters(agents),
             "school": self.generate_school_clusters(agents),
@@ -186,54 +555,104 @@ class CityClusterGenerator:
     
     def generate_home_clusters(self, agents):
         home_subclusters = []
-        household_id_counter = 0  # Contador único para asignar household_id
         cluster = ClusterWithSubclusters(home_subclusters, "home", ["morning", "night"], interaction_probability=random.uniform(0.8, 1.0))
 
+        index = self.index(agents)
+
+        household_offsets = [np.zeros(1, dtype=np.int64)]
+        household_positions = []
+        num_members = 0
         for municipio, data in self.municipal_data.items():
-            municipio_agents = [agent for agent in agents if agent.municipio == municipio]
-            total_population = len(municipio_agents)
+            municipio_positions = index.municipio_positions(municipio).tolist()
             avg_household_size = float(data["Promedio de Personas por Unidad de Alojamiento"])
 
-            # Determinar la cantidad de hogares a partir del promedio
-            estimated_households = max(1, round(total_population / avg_household_size))
-
-            random.shuffle(municipio_agents)
-            unassigned_agents = municipio_agents.copy()
-
-            for _ in range(estimated_households):
-                if not unassigned_agents:
-                    break
-                size = max(1, round(random.gauss(avg_household_size, 1)))  # Distribución normal alrededor del promedio
-                size = min(size, len(unassigned_agents))  
-
-                household_agents = unassigned_agents[:size]
-                unassigned_agents = unassigned_agents[size:]
-
-                # Asegurar que haya al menos un adulto y un menor si es posible
-                if not any(agent.age >= 18 for agent in household_agents):
-                    adults = [a for a in unassigned_agents if a.age >= 18]
-                    if adults:
-                        household_agents.append(adults.pop(0))
-                        unassigned_agents.remove(household_agents[-1])
-                
-                if not any(agent.age < 18 for agent in household_agents):
-                    children = [a for a in unassigned_agents if a.age < 18]
-                    if children:
-                        household_agents.append(children.pop(0))
-                        unassigned_agents.remove(household_agents[-1])
-
-                # Asignar un household_id único a todos los agentes en este hogar
-                for agent in household_agents:
-                    agent.household_id = household_id_counter
-                    agent.household = household_agents
-                household_id_counter += 1  # Incrementar para el siguiente hogar
-
-                home_subclusters.append(Subcluster(household_agents, cluster, topology="complete"))
+            random.shuffle(municipio_positions)
+            offsets, members = self.form_households(index.age[municipio_positions].tolist(), avg_household_size)
+            household_offsets.append(offsets[1:] + num_members)
+            household_positions.append(np.asarray(municipio_positions, dtype=np.int64)[members])
+            num_members += len(members)
+
+        offsets = np.concatenate(household_offsets)
+        positions = np.concatenate(household_positions) if household_positions else np.zeros(0, dtype=np.int64)
+        index.set_households(offsets, positions)
+
+        # Asignar un household_id único a todos los agentes de cada hogar
+        for household_id in range(len(offsets) - 1):
+            household_agents = index.agents_at(positions[offsets[household_id]:offsets[household_id + 1]])
+            for agent in household_agents:
+                agent.household_id = household_id
+                agent.household = household_agents
+            home_subclusters.append(Subcluster(household_agents, cluster, topology="complete_implicit"))
 
         cluster.subclusters = home_subclusters
+        cluster.build_edges()
+        cluster.set_memberships(offsets, [agent.agent_id for agent in index.agents_at(positions)])
         print("Home clusters generated with a more realistic composition")
         return cluster
 
+    def form_households(self, ages, avg_household_size):
+        """
+        Reparte a los habitantes de un municipio (ya barajados) en hogares en tiempo O(n).
+
+        Reglas de composición: se forman round(n / promedio) hogares con tamaño
+        round(gauss(promedio, 1)) tomando a los habitantes en orden; si un hogar queda sin
+        adultos se le agrega el siguiente adulto sin hogar, y si queda sin menores el
+        siguiente menor. Los habitantes que sobran al formar todos los hogares quedan sin hogar.
+        Las filas de adultos y menores se recorren con punteros en lugar de buscarlas y
+        quitarlas de una lista, así que cada habitante se visita un número constante de veces.
+
+        :param ages: Edades de los habitantes, en el orden en que se asignan.
+        :param avg_household_size: Promedio de personas por unidad de alojamiento.
+        :return: (offsets, members) con índices en ``ages``: los miembros del hogar h son
+                 ``members[offsets[h]:offsets[h + 1]]``.
+        """
+        num_agents = len(ages)
+        estimated_households = max(1, round(num_agents / avg_household_size))
+        adults = [i for i, age in enumerate(ages) if age >= 18]
+        children = [i for i, age in enumerate(ages) if age < 18]
+        assigned = bytearray(num_agents)
+        remaining = num_agents
+        position = adult_position = child_position = 0
+
+        offsets = [0]
+        members = []
+        for _ in range(estimated_households):
+            if not remaining:
+                break
+            size = max(1, round(random.gauss(avg_household_size, 1)))  # Distribución normal alrededor del promedio
+            size = min(size, remaining)
+
+            has_adult = has_child = False
+            for _ in range(size):
+                while assigned[position]:
+                    position += 1
+                assigned[position] = 1
+                members.append(position)
+                if ages[position] >= 18:
+                    has_adult = True
+                else:
+                    has_child = True
+            remaining -= size
+
+            # Asegurar que haya al menos un adulto y un menor si es posible
+            if not has_adult:
+                while adult_position < len(adults) and assigned[adults[adult_position]]:
+                    adult_position += 1
+                if adult_position < len(adults):
+                    assigned[adults[adult_position]] = 1
+                    members.append(adults[adult_position])
+                    remaining -= 1
+            if not has_child:
+                while child_position < len(children) and assigned[children[child_position]]:
+                    child_position += 1
+                if child_position < len(children):
+                    assigned[children[child_position]] = 1
+                    members.append(children[child_position])
+                    remaining -= 1
+            offsets.append(len(members))
+
+        return np.asarray(offsets, dtype=np.int64), np.asarray(members, dtype=np.int64)
+
     # def generate_home_clusters(self, agents): # TODO mejorar la asinacion de hogares para no tener que apsar de nuevo
     #     home_subclusters = []
     #     household_id_counter = 0  # 🔹 Contador único para asignar household_id
@@ -282,7 +701,8 @@ class CityClusterGenerator:
     def generate_work_clusters(self, agents):
         work_subclusters = []
         cluster = ClusterWithSubclusters(work_subclusters, "work", ["daytime"], interaction_probability=random.uniform(0.3, 0.6))
-        workers = [agent for agent in agents if agent.occupation == "worker"]
+        index = self.index(agents)
+        workers = index.agents_at(index.occupation_positions("worker"))
         random.shuffle(workers)
         
         total_workers = len(workers)
@@ -303,9 +723,10 @@ class CityClusterGenerator:
             size = min(size, len(unassigned_agents))
             work_agents = unassigned_agents[:size]
             unassigned_agents = unassigned_agents[size:]
-            work_subclusters.append(Subcluster(work_agents, cluster, topology="scale_free"))
+            work_subclusters.append(Subcluster(work_agents, cluster, topology=self.topology))
         
         cluster.subclusters = work_subclusters
+        cluster.build_edges()
         print(f"Se generaron: {len(cluster.subclusters)} trabajos con tamaños dinámicos")
         return cluster
 
@@ -325,7 +746,7 @@ class CityClusterGenerator:
     #         size = min(size, len(unassigned_agents))
     #         work_agents = unassigned_agents[:size]
     #         unassigned_agents = unassigned_agents[size:]
-    #         work_subclusters.append(Subcluster(work_agents,cluster, topology="scale_free"))
+    #         work_subclusters.append(Subcluster(work_agents,cluster, topology=self.topology))
         
     #     cluster.subclusters = work_subclusters
     #     print(f"Se generaron : {len(cluster.subclusters)} trabajos")
@@ -335,21 +756,18 @@ class CityClusterGenerator:
     def generate_shopping_clusters(self, agents):
         shopping_subclusters = []
         cluster = ClusterWithSubclusters(shopping_subclusters, "shopping", ["evening"],interaction_probability=random.uniform(0.1, 0.4))
-        household_representatives = {}
+        index = self.index(agents)
 
         # ✅ Seleccionar un representante mayor de 18 años por hogar
-        for agent in agents:  
-            if agent.household_id not in household_representatives and agent.age >= 18:
-                household_representatives[agent.household_id] = agent
-
-        shoppers = list(household_representatives.values())
+        shoppers = index.agents_at(index.household_representatives(min_age=18))
         random.shuffle(shoppers)
 
         # ✅ Usar self.total_stores como número fijo de tiendas
         num_shopping_centers = min(self.total_stores, max(1, len(shoppers) // 50))
 
         if num_shopping_centers == 0:
-            return ClusterWithSubclusters([], "shopping", ["evening"])  # Evitar errores si no hay shoppers
+            # Evitar errores si no hay shoppers
+            return ClusterWithSubclusters([], "shopping", ["evening"], interaction_probability=cluster.interaction_probability)
 
         # ✅ Distribuir compradores en las tiendas
         shopping_sizes = [random.randint(15, 40) for _ in range(num_shopping_centers)]  
@@ -361,9 +779,10 @@ class CityClusterGenerator:
             size = min(size, len(unassigned_shoppers))
             shopping_agents = unassigned_shoppers[:size]
             unassigned_shoppers = unassigned_shoppers[size:]
-            shopping_subclusters.append(Subcluster(shopping_agents,cluster, topology="scale_free"))
+            shopping_subclusters.append(Subcluster(shopping_agents,cluster, topology=self.topology))
 
         cluster.subclusters = shopping_subclusters
+        cluster.build_edges()
         print(f"Se generaron : {len(cluster.subclusters)} tiendas")
         return cluster
 
@@ -384,6 +803,7 @@ class CityClusterGenerator:
 
         # Obtener el número total de escuelas por tipo desde el diccionario general
         total_schools = self.data.get("Escuelas_Total", {})
+        index = self.index(agents)
         
         # Filtrar estudiantes por rango de edad y asignarlos a escuelas
         for school_type, num_schools in total_schools.items():
@@ -393,15 +813,11 @@ class CityClusterGenerator:
             age_range = school_age_mapping[school_type]
             
             # Filtrar estudiantes en el rango de edad correspondiente
-            students = [
-                agent for agent in agents 
-                if agent.occupation == "student" 
-                and age_range[0] <= agent.age <= age_range[1]
-            ]
+            students = index.agents_at(index.age_positions(age_range[0], age_range[1], occupation="student"))
             random.shuffle(students)
 
             # Crear escuelas del tipo actual
-            school_sizes = [random.randint(20, 50) for _ in range(int(num_schools))]
+            school_sizes = [random.randint(20, 50) for _ in range(self._scaled(num_schools))]
             unassigned_students = students.copy()
 
             for size in school_sizes:
@@ -413,9 +829,10 @@ class CityClusterGenerator:
                 unassigned_students = unassigned_students[size:]
 
                 # Crear un subcluster para la escuela
-                school_subclusters.append(Subcluster(school_agents, cluster, topology="scale_free"))
+                school_subclusters.append(Subcluster(school_agents, cluster, topology=self.topology))
 
         cluster.subclusters = school_subclusters
+        cluster.build_edges()
         print(f"Se generaron : {len(cluster.subclusters)} escuelas")
         return cluster
     # def generate_school_clusters(self, agents):
@@ -450,7 +867,7 @@ class CityClusterGenerator:
     #                 size = min(size, len(unassigned_students))
     #                 school_agents = unassigned_students[:size]
     #                 unassigned_students = unassigned_students[size:]
-    #                 school_subclusters.append(Subcluster(school_agents,cluster, topology="scale_free"))
+    #                 school_subclusters.append(Subcluster(school_agents,cluster, topology=self.topology))
 
     #     cluster.subclusters = school_subclusters
     #     print("School clusters generated")
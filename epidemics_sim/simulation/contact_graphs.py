@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def barabasi_albert_edges(sizes, m, rng):
+    """
+    Genera grafos de Barabási–Albert para muchos subclusters a la vez.
+
+    Sigue el mismo proceso que networkx.barabasi_albert_graph: cada grafo parte de una
+    estrella de m + 1 nodos y cada nodo nuevo se une a m nodos distintos elegidos con
+    probabilidad proporcional a su grado (muestreando una lista donde cada nodo aparece
+    una vez por arista). En lugar de una llamada por subcluster, en cada paso se agrega
+    el nodo t de todos los subclusters que lo tienen, con operaciones sobre arreglos.
+    Los subclusters con n <= m nodos quedan como una estrella de n nodos, igual que
+    barabasi_albert_graph(n, n - 1).
+
+    :param sizes: Número de agentes de cada subcluster.
+    :param m: Aristas que agrega cada nodo nuevo.
+    :param rng: numpy.random.Generator.
+    :return: (edge_offsets, edges): las aristas del subcluster i son
+             ``edges[edge_offsets[i]:edge_offsets[i + 1]]``, pares de índices locales (int32).
+    """
+    sizes = np.asarray(sizes, dtype=np.int64).reshape(-1)
+    hub_degree = np.minimum(np.maximum(sizes - 1, 0), m)  # Grado del centro de la estrella inicial
+    num_edges = hub_degree + m * np.maximum(sizes - m - 1, 0)
+    edge_offsets = np.concatenate(([0], np.cumsum(num_edges)))
+    edges = np.empty((edge_offsets[-1], 2), dtype=np.int32)
+
+    # Estrella inicial: el nodo 0 unido a 1..hub_degree
+    star_offsets = np.concatenate(([0], np.cumsum(hub_degree)))[:-1]
+    leaf = np.arange(hub_degree.sum()) - np.repeat(star_offsets, hub_degree) + 1
+    edges[np.repeat(edge_offsets[:-1], hub_degree) + leaf - 1] = np.column_stack((np.zeros_like(leaf), leaf))
+
+    # Nodos repetidos una vez por arista, en un bloque de 2 * aristas por subcluster
+    repeated = np.empty(2 * edge_offsets[-1], dtype=np.int32)
+    base = 2 * edge_offsets[:-1]
+    for node in range(1, m + 1):
+        has_leaf = hub_degree >= node
+        repeated[base[has_leaf] + 2 * (node - 1)] = 0
+        repeated[base[has_leaf] + 2 * (node - 1) + 1] = node
+
+    for source in range(m + 1, int(sizes.max(initial=0))):
+        active = np.flatnonzero(sizes > source)
+        length = 2 * m * (source - m)  # Entradas ya escritas en el bloque de cada subcluster activo
+        targets = _unique_picks(repeated, base[active], length, m, rng)
+
+        slots = edge_offsets[active] + m + (source - m - 1) * m
+        positions = slots[:, None] + np.arange(m)
+        edges[positions, 0] = source
+        edges[positions, 1] = targets
+
+        written = base[active][:, None] + length
+        repeated[written + np.arange(m)] = targets
+        repeated[written + m + np.arange(m)] = source
+
+    return edge_offsets, edges
+
+
+def _unique_picks(repeated, bases, length, m, rng):
+    """
+    Elige m entradas distintas del bloque de cada subcluster, volviendo a sortear las repetidas.
+    """
+    picks = repeated[bases[:, None] + rng.integers(0, length, size=(len(bases), m))]
+    while True:
+        order = np.argsort(picks, axis=1, kind="stable")
+        ordered = np.take_along_axis(picks, order, axis=1)
+        duplicated = np.zeros(picks.shape, dtype=np.bool_)
+        duplicated[:, 1:] = ordered[:, 1:] == ordered[:, :-1]
+        if not duplicated.any():
+            return picks
+        rows, columns = np.nonzero(duplicated)
+        columns = order[rows, columns]
+        picks[rows, columns] = repeated[bases[rows] + rng.integers(0, length, size=len(rows))]
+
+
+def geometric_edge_sample(num_edges, probability, rng):
+    """
+    Índices de las aristas que se realizan cuando cada una ocurre con ``probability``.
+
+    En lugar de un número aleatorio por arista, se sortean los saltos entre aristas
+    realizadas (distribución geométrica), así que el costo depende de las aristas que
+    se realizan y no de todas las posibles. Equivale a ``rng.random(num_edges) < probability``.
+
+    :param num_edges: Número de aristas candidatas.
+    :param probability: Probabilidad de que se realice cada arista.
+    :param rng: numpy.random.Generator.
+    :return: Arreglo ordenado de índices de aristas realizadas.
+    """
+    if probability <= 0 or num_edges == 0:
+        return np.zeros(0, dtype=np.int64)
+    if probability >= 1:
+        return np.arange(num_edges, dtype=np.int64)
+
+    chunks = []
+    position = -1
+    # Se piden algunos saltos más que la media para que casi siempre baste una ronda
+    expected = num_edges * probability
+    batch = int(expected + 4 * np.sqrt(expected * (1 - probability)) + 16)
+    while True:
+        positions = position + np.cumsum(rng.geometric(probability, size=batch))
+        chunks.append(positions[positions < num_edges])
+        if positions[-1] >= num_edges:
+            return np.concatenate(chunks)
+        position = positions[-1]
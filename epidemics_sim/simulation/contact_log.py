@@ -0,0 +1,68 @@
+import collections
+import json
+import os
+import numpy as np
+
+# Los resultados diarios de DailySimulation solo guardan agregados; los contactos crudos se
+# guardan solo si se pasa uno de estos registros como contact_log.
+
+
+def contact_arrays(contacts):
+    """
+    Convierte los contactos de una capa (lista de pares o tupla (sources, targets)) en un arreglo (k, 2) int32.
+    """
+    if isinstance(contacts, tuple) and len(contacts) == 2 and isinstance(contacts[0], np.ndarray):
+        return np.column_stack(contacts).astype(np.int32)
+    return np.asarray(contacts, dtype=np.int32).reshape(-1, 2)
+
+
+class ContactRingBuffer:
+    def __init__(self, days):
+        """
+        Contactos crudos de los últimos ``days`` días; los más viejos se descartan.
+
+        :param days: Días que se conservan.
+        """
+        self.days = collections.deque(maxlen=days)
+
+    def record(self, day, contacts):
+        """
+        :param day: Día simulado.
+        :param contacts: Diccionario capa -> contactos del día.
+        """
+        self.days.append((day, {layer: contact_arrays(pairs) for layer, pairs in contacts.items()}))
+
+    def __iter__(self):
+        return iter(self.days)
+
+    def __len__(self):
+        return len(self.days)
+
+
+class ContactSpillWriter:
+    def __init__(self, directory):
+        """
+        Escribe los contactos crudos de cada día en disco, un archivo .npy por día y capa
+        (``day_<día>_<capa>.npy``, pares de IDs int32), más un índice contacts.json.
+
+        :param directory: Directorio de destino (se crea si no existe).
+        """
+        self.directory = directory
+        self.index = []
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, day, contacts):
+        files = {}
+        for layer, pairs in contacts.items():
+            name = f"day_{day}_{layer}.npy"
+            np.save(os.path.join(self.directory, name), contact_arrays(pairs))
+            files[layer] = name
+        self.index.append({"day": day, "files": files})
+        with open(os.path.join(self.directory, "contacts.json"), "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=2)
+
+    def load(self, day, layer):
+        """
+        Contactos guardados de un día y una capa, abiertos con np.memmap.
+        """
+        return np.load(os.path.join(self.directory, f"day_{day}_{layer}.npy"), mmap_mode="r")
@@ -0,0 +1,129 @@
+import collections
+import numpy as np
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.agents.base_agent import State, SEVERITIES, STATES_BY_VALUE
+
+# Franjas de edad de 10 años; la última agrupa a los de 90 o más
+AGE_BAND_WIDTH = 10
+NUM_AGE_BANDS = 10
+NUM_STATES = max(state.value for state in State) + 1
+
+
+class EpidemicCounters:
+    def __init__(self, agents, municipios=()):
+        """
+        Conteos de agentes por estado, municipio, franja de edad y severidad.
+
+        Se llenan con una sola pasada sobre la población y después se mantienen con
+        ``record``, que se registra como listener de las transiciones de los agentes
+        (add_transition_listener): cada transición cuesta O(1). Las estadísticas diarias,
+        el SimulationAnalyzer y la evaluación de políticas leen de aquí en lugar de recorrer
+        la población. Se cuentan agentes (``counts``) y personas representadas (``people``,
+        sumando ``agent.weight``).
+
+        :param agents: Población (AgentStore o diccionario de agentes).
+        :param municipios: Nombres de los municipios; se agregan los que aparezcan en la población.
+        """
+        self.municipios = list(agents.municipios if isinstance(agents, AgentStore) else municipios)
+        self._municipio_codes = {municipio: code for code, municipio in enumerate(self.municipios)}
+        self._last = {}  # ID -> (estado, severidad) de los agentes que no están en (SUSCEPTIBLE, None)
+        self.transitions = collections.Counter()  # (estado anterior, estado nuevo) -> cantidad, ver pop_transitions
+
+        if isinstance(agents, AgentStore):
+            shape = (NUM_STATES, len(self.municipios), NUM_AGE_BANDS, len(SEVERITIES))
+            self.counts = np.zeros(shape, dtype=np.int64)
+            self.people = np.zeros(shape, dtype=np.float64)
+            cells = (
+                agents.state.astype(np.int64), agents.municipio.astype(np.int64),
+                _age_band(agents.age.astype(np.int64)), agents.severity.astype(np.int64)
+            )
+            np.add.at(self.counts, cells, 1)
+            np.add.at(self.people, cells, agents.weight.astype(np.float64))
+            for row in np.flatnonzero((agents.state != State.SUSCEPTIBLE.value) | (agents.severity != 0)).tolist():
+                agent_id = row + agents.first_id
+                self._last[agent_id] = (agents.state[row].item(), agents.severity[row].item())
+        else:
+            for agent in agents.values():
+                self._municipio_code(agent.municipio)
+            shape = (NUM_STATES, len(self.municipios), NUM_AGE_BANDS, len(SEVERITIES))
+            self.counts = np.zeros(shape, dtype=np.int64)
+            self.people = np.zeros(shape, dtype=np.float64)
+            for agent_id, agent in agents.items():
+                key = (agent.state.value, SEVERITIES.index(agent.infection_status["severity"]))
+                self._add(agent, key, 1)
+                if key != (State.SUSCEPTIBLE.value, 0):
+                    self._last[agent_id] = key
+
+    def record(self, agent):
+        """
+        Actualiza los conteos después de una transición de ``agent``.
+        """
+        key = (agent.state.value, SEVERITIES.index(agent.infection_status["severity"]))
+        previous = self._last.get(agent.agent_id, (State.SUSCEPTIBLE.value, 0))
+        if key == previous:
+            return
+        self._add(agent, previous, -1)
+        self._add(agent, key, 1)
+        if key[0] != previous[0]:
+            self.transitions[(STATES_BY_VALUE[previous[0]].name, agent.state.name)] += 1
+        if key == (State.SUSCEPTIBLE.value, 0):
+            del self._last[agent.agent_id]
+        else:
+            self._last[agent.agent_id] = key
+
+    def pop_transitions(self):
+        """
+        Cambios de estado desde la última llamada, como diccionario (anterior, nuevo) -> cantidad.
+        """
+        transitions, self.transitions = dict(self.transitions), collections.Counter()
+        return transitions
+
+    def _add(self, agent, key, sign):
+        cell = (key[0], self._municipio_code(agent.municipio), _age_band(agent.age), key[1])
+        self.counts[cell] += sign
+        self.people[cell] += sign * agent.weight
+
+    def _municipio_code(self, municipio):
+        code = self._municipio_codes.get(municipio)
+        if code is None:
+            code = self._municipio_codes[municipio] = len(self.municipios)
+            self.municipios.append(municipio)
+            if hasattr(self, "counts"):
+                padding = [(0, 0), (0, 1), (0, 0), (0, 0)]
+                self.counts = np.pad(self.counts, padding)
+                self.people = np.pad(self.people, padding)
+        return code
+
+    def _table(self, weighted):
+        return self.people if weighted else self.counts
+
+    def count(self, state, weighted=False):
+        """
+        Agentes (o personas, con weighted=True) en el estado ``state``.
+        """
+        return self._table(weighted)[state.value].sum().item()
+
+    def by_municipio(self, state, weighted=False):
+        """
+        Diccionario municipio -> agentes (o personas) en el estado ``state``.
+        """
+        return dict(zip(self.municipios, self._table(weighted)[state.value].sum(axis=(1, 2)).tolist()))
+
+    def by_age_band(self, state, weighted=False):
+        """
+        Lista con los agentes (o personas) en el estado ``state`` de cada franja de edad.
+        """
+        return self._table(weighted)[state.value].sum(axis=(0, 2)).tolist()
+
+    def by_severity(self, state=State.INFECTED, weighted=False):
+        """
+        Diccionario severidad -> agentes (o personas) en el estado ``state``.
+        """
+        return dict(zip(SEVERITIES, self._table(weighted)[state.value].sum(axis=(0, 1)).tolist()))
+
+    def total(self, weighted=False):
+        return self._table(weighted).sum().item()
+
+
+def _age_band(age):
+    return np.minimum(age // AGE_BAND_WIDTH, NUM_AGE_BANDS - 1)
@@ -1,13 +1,25 @@
+import collections
 import random
+import numpy as np
 from epidemics_sim.simulation.clusters import CityClusterGenerator
+from epidemics_sim.simulation.frontier import InfectionFrontier
+from epidemics_sim.simulation.counters import EpidemicCounters
+from epidemics_sim.simulation.event_calendar import EventCalendar
+from epidemics_sim.agents.base_agent import add_transition_listener, remove_transition_listener
 from epidemics_sim.agents.base_agent import State
 from multiprocessing import Pool
 from epidemics_sim.simulation.logger import setup_logger
 
 logger = setup_logger()
 
+# Período del día en que se simula cada tipo de cluster
+CLUSTER_PERIODS = {"home": "morning", "work": "daytime", "school": "daytime", "shopping": "evening"}
+# Fallecidos acumulados antes de quitar sus aristas de los clusters (hasta entonces los excluye la máscara de vivos)
+DECEASED_BATCH = 1000
+
 class DailySimulation:
-    def __init__(self, agents, cluster_generator, disease_model, policies, healthcare_system, initial_infected):
+    def __init__(self, agents, cluster_generator, disease_model, policies, healthcare_system, initial_infected, clusters=None, fused=True,
+                 contact_log=None, event_calendar=True):
         """
         Initialize the daily simulation controller.
 
@@ -20,18 +32,39 @@ class DailySimulation:
         :param healthcare_system: Instance of the HealthcareSystem to manage healthcare.
         :param analyzer: Instance of SimulationAnalyzer to track statistics.
         :param initial_infected: Number of agents to infect at the start of the simulation.
+        :param clusters: Prebuilt clusters (e.g. loaded from the artifact cache); generated if None.
+        :param fused: Use simulate_day_fused (only contacts of contagious and newly infected agents
+                      are sampled and transmission is evaluated right away, with the same chaining
+                      as propagate) instead of simulate_day + propagate.
+        :param contact_log: Optional ContactRingBuffer or ContactSpillWriter that receives the raw
+                            contacts of each day; by default only daily aggregates are kept.
+        :param event_calendar: Progress infections with scheduled events (DiseaseModel.schedule_infection)
+                               instead of calling progress_infection for every infected agent each day.
+                               Required by disease models with compartments, which only progress on
+                               the calendar.
         """
+        if not event_calendar and getattr(disease_model, "compartments", None) is not None:
+            raise ValueError(f"{disease_model.name} progresses through its compartments; use event_calendar=True")
         self.agents = agents
         self.cluster_generator = cluster_generator
         
         self.disease_model = disease_model
         self.policies = policies
         self.healthcare_system = healthcare_system
+        self.fused = fused
+        self.contact_log = contact_log
+        self.results = []
+        self.calendar = EventCalendar() if event_calendar else None
+        self._unscheduled = []  # Infecciones iniciales; se programan el día 0, como las demás
         #self.analyzer = analyzer
-        self.clusters = self.cluster_generator.generate_clusters(self.agents.values())
+        self.clusters = clusters if clusters is not None else self.cluster_generator.generate_clusters(self.agents.values())
 
         # Initialize infections
         self._initialize_infections(initial_infected)
+        self.frontier = InfectionFrontier(self.agents)
+        self.counters = EpidemicCounters(self.agents)
+        for cluster in self.clusters.values():
+            cluster.alive = self.frontier.alive
 
     def _initialize_infections(self, initial_infected):
         """
@@ -41,6 +74,7 @@ class DailySimulation:
         """
         infected_agents = random.sample(list(self.agents.values()), initial_infected)
         self.disease_model.initialize_infections(infected_agents)
+        self._unscheduled = infected_agents
 
 
     def simulate(self, days):
@@ -50,7 +84,18 @@ class DailySimulation:
         :param days: Number of days to simulate.
         :return: Summary of interactions and disease progression over the simulation period.
         """
-        simulation_results = []
+        # Los contadores se mantienen con las transiciones de los agentes mientras dura la simulación
+        add_transition_listener(self.counters.record)
+        try:
+            self._simulate_days(days)
+        finally:
+            remove_transition_listener(self.counters.record)
+
+        # 5️⃣ Generar reporte y gráficos
+        self.healthcare_system.analyzer.generate_full_report()
+        return self.results
+
+    def _simulate_days(self, days):
         week_counter = 0
         last_infected = 0
         for day in range(days):
@@ -60,15 +105,29 @@ class DailySimulation:
             print("...")
 
             # 1️⃣ Simular interacciones y propagación
-            daily_summary = self.simulate_day(day)
-
-            for a,b in daily_summary.items():
-                print(f"Interacciones en {a} : {len(b)}")
-            
-            simulation_results.append(daily_summary)
-
-            # 2️⃣ Propagar enfermedad solo con los agentes activos
-            infected = self.disease_model.propagate(daily_summary, self.agents)
+            if self.fused:
+                new_by_layer, daily_summary = self.simulate_day_fused(day)
+            else:
+                daily_summary = self.simulate_day(day)
+
+            for a in daily_summary:
+                print(f"Interacciones en {a} : {self.clusters[a].interaction_count}")
+
+            if self.contact_log is not None:
+                self.contact_log.record(day, daily_summary)
+
+            # 2️⃣ Propagar enfermedad solo con los agentes activos (capa por capa, en el mismo orden)
+            if not self.fused:
+                new_by_layer = {
+                    layer: self.disease_model.propagate({layer: interactions}, self.agents)
+                    for layer, interactions in daily_summary.items()
+                }
+                for new in new_by_layer.values():
+                    self.frontier.update_many(new.values())
+            infected = {}
+            for new in new_by_layer.values():
+                for agent in new.values():
+                    infected[len(infected) + 1] = agent
             print(f"Agentes infectados despues de la propagacion: {len(infected)}")
 
             count = 0
@@ -81,42 +140,63 @@ class DailySimulation:
            # print(f"Agentes infectados despues de la propagacion: {count}")
             
             # 2️⃣ Progresar la infección en los agentes
-            logger.info("Agentes infectados de Agents :")
-            infectados = 0
-            for agent in self.agents.keys():
-                if self.agents[agent].infection_status['state'] is State.INFECTED:
+            if self.calendar is not None:
+                # Se programan las infecciones nuevas y solo se procesan los eventos de hoy
+                scheduled = self._unscheduled + list(infected.values())
+                self.disease_model.schedule_infections(scheduled, day, self.calendar)
+                self.frontier.update_many(scheduled)
+                self._unscheduled = []
+                for agent in self.disease_model.process_events(day, self.calendar, self.agents):
+                    self.frontier.update(agent, self.agents[agent])
+            else:
+                # Solo se recorren los infectados; el frontier se actualiza con cada transición
+                logger.info("Agentes infectados de Agents :")
+                for agent in self.frontier.infected_ids():
                     logger.debug(self.agents[agent])
-                    infectados +=1
                     self.disease_model.progress_infection(agent,self.agents)
+                    self.frontier.update(agent, self.agents[agent])
 
+            print(f"Día {day}: Susceptibles={self.counters.count(State.SUSCEPTIBLE)}, "
+            f"Infectados={self.counters.count(State.INFECTED)}, "
+            f"Recuperados={self.counters.count(State.RECOVERED)}, "
+            f"Muertos={self.counters.count(State.DECEASED)}")
 
-
-            
-            print(f"Día {day}: Susceptibles={sum(1 for a in self.agents.values() if a.infection_status['state'] == State.SUSCEPTIBLE)}, "
-            f"Infectados={sum(1 for a in self.agents.values() if a.infection_status['state'] == State.INFECTED)}, "
-            f"Recuperados={sum(1 for a in self.agents.values() if a.infection_status['state'] == State.RECOVERED)}, "
-            f"Muertos={sum(1 for a in self.agents.values() if a.infection_status['state'] == State.DECEASED)}")
+            # Solo agregados por día; los contactos crudos van a contact_log si se pidió
+            self.results.append(self._day_result(day, new_by_layer))
 
             
 
             # 3️⃣ Ejecutar las operaciones del sistema de salud
-            #self.healthcare_system.daily_operations(self.agents.values(), self.clusters,sum([len(interactions) for interactions in daily_summary.values()]), day)
+            #self.healthcare_system.daily_operations(self.agents.values(), self.clusters,sum([len(interactions) for interactions in daily_summary.values()]), day, self.counters)
 
             
             
-            # 4️⃣ Eliminar agentes muertos después de registrar estadísticas
-            # deceased = [agent for agent in self.agents.values() if agent.infection_status["state"] == State.DECEASED]
-            # if len(deceased) > 0:
-            self.agents = {agent_id: agent for agent_id, agent in self.agents.items() if agent.infection_status["state"] is not State.DECEASED}
-
-                # pOR AHORA SOLO LOS IGNORA, ASI OPTIMIZO EL CODIGO
-                # for cluster in self.clusters.values(): # ver si se puede optimizar para que solamente los 
-                #     cluster.remove_deceased_agents(deceased)
+            # 4️⃣ Los muertos quedan fuera de las interacciones por frontier.alive; sus aristas
+            # se eliminan de los clusters por lotes, sin reconstruir self.agents
+            if self.frontier.pending_deceased() >= DECEASED_BATCH:
+                deceased = self.frontier.pop_deceased()
+                for cluster in self.clusters.values():
+                    cluster.remove_agents(deceased)
 
             week_counter +=1
 
-        # 5️⃣ Generar reporte y gráficos
-        self.healthcare_system.analyzer.generate_full_report()
+    def _day_result(self, day, new_by_layer):
+        """
+        Compact summary of a simulated day.
+
+        :param new_by_layer: Newly infected agents per cluster type.
+        :return: Dictionary with the contacts and new infections per cluster type, the new
+                 infections per municipio and the state transitions of the day.
+        """
+        return {
+            "day": day,
+            "contacts": {layer: self.clusters[layer].interaction_count for layer in new_by_layer},
+            "new_infections": {layer: len(new) for layer, new in new_by_layer.items()},
+            "new_infections_by_municipio": dict(collections.Counter(
+                agent.municipio for new in new_by_layer.values() for agent in new.values()
+            )),
+            "transitions": self.counters.pop_transitions(),
+        }
 
 
     def simulate_day(self, day):
@@ -162,6 +242,49 @@ class DailySimulation:
         
         return daily_interactions
 
+    def simulate_day_fused(self, day):
+        """
+        Simulate a day sampling only the contacts that can transmit and evaluating them at once.
+
+        Each cluster samples just the edges incident to the contagious agents
+        (ClusterWithSubclusters.contagious_contacts) and the disease model evaluates those
+        contacts directly, so no list with every interaction of the day is built. Agents
+        infected in a cluster get their not yet sampled edges sampled in further rounds, and
+        every contact is evaluated at its position in the simulate_interactions order, so
+        infections chain within a cluster as with propagate. They are also contagious in
+        the clusters simulated after it.
+
+        :return: Tuple (newly infected agents per cluster type, as returned by propagate;
+                 sampled (sources, targets) contacts per cluster type).
+                 The total number of contacts is left in each cluster's interaction_count.
+        """
+        rng = np.random.default_rng(random.getrandbits(64))
+        contagious = self.frontier.contagious_ids()
+        new_by_layer = {}
+        contacts = {}
+        for cluster_type, period in CLUSTER_PERIODS.items():
+            cluster = self.clusters[cluster_type]
+            chain = {"hits": [], "infected": np.zeros(0, dtype=np.int64)}
+
+            def spread(sources, targets, order):
+                # Se sortean una sola vez los dos sentidos de cada contacto nuevo y se recalcula
+                # quiénes se infectan con todos los contactos exitosos del cluster
+                chain["hits"].append(self.disease_model.transmission_hits(
+                    np.concatenate((sources, targets)), np.concatenate((targets, sources)), self.agents, rng,
+                    np.concatenate((order, order ^ 1))
+                ))
+                hits = [np.concatenate(column) for column in zip(*chain["hits"])]
+                chain["infected"] = self.disease_model.infection_order(*hits, self.agents)
+                return chain["infected"]
+
+            contacts[cluster_type] = cluster.contagious_contacts(period, contagious, rng, spread)
+            new = self.disease_model.infect_ids(chain["infected"], self.agents)
+            new_by_layer[cluster_type] = new
+            if new:
+                self.frontier.update_many(new.values())
+                contagious = self.frontier.contagious_ids()
+        return new_by_layer, contacts
+
     def _simulate_period(self, period, agents = None):
         """
         Simulate interactions for a specific period.
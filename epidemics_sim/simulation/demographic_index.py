@@ -0,0 +1,115 @@
+import numpy as np
+from epidemics_sim.agents.human_agent import OCCUPATIONS
+
+MAX_AGE = 120
+
+
+class DemographicIndex:
+    def __init__(self, agents, municipios):
+        """
+        Índice de la población agrupada por municipio, ocupación, edad y hogar.
+
+        Se construye con una sola pasada sobre los agentes y lo comparten todos los
+        generadores de CityClusterGenerator, que así no vuelven a recorrer la población.
+        Cada grupo se guarda como (offsets, positions): las posiciones de los agentes con
+        código c son ``positions[offsets[c]:offsets[c + 1]]``, en el orden original.
+
+        :param agents: Iterable de agentes (HumanAgent, CompactHumanAgent o AgentView).
+        :param municipios: Nombres de los municipios (índice = código de municipio).
+        """
+        self.municipios = list(municipios)
+        municipio_codes = {municipio: code for code, municipio in enumerate(self.municipios)}
+        occupation_codes = {occupation: code for code, occupation in enumerate(OCCUPATIONS)}
+
+        self.agents = []
+        ages, municipio, occupation, household = [], [], [], []
+        for agent in agents:
+            self.agents.append(agent)
+            ages.append(agent.age)
+            municipio.append(municipio_codes.get(agent.municipio, -1))
+            occupation.append(occupation_codes.get(agent.occupation, -1))
+            household.append(-1 if agent.household_id is None else agent.household_id)
+
+        self.size = len(self.agents)
+        self.age = np.asarray(ages, dtype=np.int64).reshape(-1)
+        self.municipio = np.asarray(municipio, dtype=np.int64).reshape(-1)
+        self.occupation = np.asarray(occupation, dtype=np.int64).reshape(-1)
+        self.household = np.asarray(household, dtype=np.int64).reshape(-1)  # -1 = sin hogar
+        self._groups = {
+            "municipio": _group(self.municipio, len(self.municipios)),
+            "occupation": _group(self.occupation, len(OCCUPATIONS)),
+            "age": _group(np.minimum(self.age, MAX_AGE), MAX_AGE + 1),
+        }
+
+    def group(self, key):
+        """
+        (offsets, positions) del grupo ``key`` ("municipio", "occupation", "age" o "household").
+        """
+        return self._groups[key]
+
+    def positions(self, key, code):
+        """
+        Posiciones de los agentes con el código ``code`` en el grupo ``key``, en el orden original.
+        """
+        offsets, positions = self._groups[key]
+        if not 0 <= code < len(offsets) - 1:
+            return positions[:0]
+        return positions[offsets[code]:offsets[code + 1]]
+
+    def municipio_positions(self, municipio):
+        return self.positions("municipio", self.municipios.index(municipio))
+
+    def occupation_positions(self, occupation):
+        return self.positions("occupation", OCCUPATIONS.index(occupation))
+
+    def age_positions(self, min_age, max_age, occupation=None):
+        """
+        Posiciones de los agentes con min_age <= edad <= max_age (y la ocupación dada), en el orden original.
+        """
+        offsets, positions = self._groups["age"]
+        min_age, max_age = max(min_age, 0), min(max_age, MAX_AGE)
+        selected = np.sort(positions[offsets[min_age]:offsets[max_age + 1]]) if min_age <= max_age else positions[:0]
+        if occupation is not None:
+            selected = selected[self.occupation[selected] == OCCUPATIONS.index(occupation)]
+        return selected
+
+    def set_households(self, offsets, positions):
+        """
+        Registra los hogares formados por generate_home_clusters.
+
+        :param offsets: Arreglo de longitud número de hogares + 1.
+        :param positions: Posiciones de los agentes agrupadas por hogar.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        self.household[:] = -1
+        self.household[positions] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        self._groups["household"] = (offsets, positions)
+
+    def household_representatives(self, min_age=18):
+        """
+        Posición del primer agente de cada hogar con edad >= min_age, en el orden original.
+
+        Los agentes sin hogar cuentan como un único hogar, igual que cuando se agrupaba por
+        ``agent.household_id`` (None incluido).
+        """
+        adults = np.flatnonzero(self.age >= min_age)
+        _, first = np.unique(self.household[adults], return_index=True)
+        return np.sort(adults[first])
+
+    def agents_at(self, positions):
+        """
+        Lista de agentes en las posiciones indicadas.
+        """
+        agents = self.agents
+        return [agents[position] for position in np.asarray(positions).tolist()]
+
+    def __len__(self):
+        return self.size
+
+
+def _group(codes, num_codes):
+    valid = np.flatnonzero(codes >= 0)
+    positions = valid[np.argsort(codes[valid], kind="stable")]
+    counts = np.bincount(codes[valid], minlength=num_codes)
+    return np.concatenate(([0], np.cumsum(counts))).astype(np.int64), positions
@@ -0,0 +1,30 @@
+# Tipos de evento de la progresión de una infección
+ONSET = "onset"        # Fin de la incubación: empieza a contagiar y se define la severidad
+OUTCOME = "outcome"    # Recuperación o muerte
+WANING = "waning"      # Vence la inmunidad y vuelve a ser susceptible
+
+
+class EventCalendar:
+    def __init__(self):
+        """
+        Cola de eventos agrupados por día.
+
+        Al infectarse un agente, el modelo de enfermedad programa de una vez los días en
+        que termina la incubación, se resuelve la infección y vence la inmunidad
+        (DiseaseModel.schedule_infection); cada día solo se procesan los eventos de ese
+        día, así que el costo diario es proporcional a las transiciones del día y no al
+        número de infectados.
+        """
+        self._days = {}  # día -> lista de (tipo de evento, ID del agente)
+
+    def schedule(self, day, kind, agent_id):
+        self._days.setdefault(day, []).append((kind, agent_id))
+
+    def pop(self, day):
+        """
+        Eventos del día ``day`` en el orden en que se programaron; se quitan del calendario.
+        """
+        return self._days.pop(day, [])
+
+    def __len__(self):
+        return sum(len(events) for events in self._days.values())
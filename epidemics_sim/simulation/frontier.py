@@ -0,0 +1,90 @@
+import numpy as np
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.agents.base_agent import State
+
+
+class InfectionFrontier:
+    def __init__(self, agents):
+        """
+        Conjuntos de IDs de los agentes activos (infectados, contagiosos, recuperados y fallecidos).
+
+        Se recorre la población una sola vez al crearlo; después solo se actualiza con
+        ``update`` para los agentes que cambian de estado (nuevos infectados y agentes que
+        progresan), así que avanzar la infección cuesta O(activos) por día en lugar de
+        O(población). Los conteos por estado los lleva EpidemicCounters.
+
+        ``alive`` es una máscara indexada por ID de agente que los clusters consultan al
+        muestrear interacciones, así que los fallecidos no hace falta quitarlos de la población.
+
+        :param agents: Población (AgentStore o diccionario de agentes).
+        """
+        self.infected = set()
+        self.contagious = set()
+        self.recovered = set()  # Recuperados con inmunidad que puede vencer
+        self.deceased = set()
+        self._pending_deceased = []  # Fallecidos que aún no se quitaron de los clusters
+
+        if isinstance(agents, AgentStore):
+            self.alive = np.ones(agents.first_id + agents.size, dtype=np.bool_)
+            rows = np.flatnonzero(agents.state != State.SUSCEPTIBLE.value)
+            for agent_id in (rows + agents.first_id).tolist():
+                self.update(agent_id, agents[agent_id])
+        else:
+            self.alive = np.ones(max(agents, default=-1) + 1, dtype=np.bool_)
+            for agent_id, agent in agents.items():
+                if agent.state is not State.SUSCEPTIBLE:
+                    self.update(agent_id, agent)
+
+    def update(self, agent_id, agent):
+        """
+        Vuelve a clasificar un agente después de un posible cambio de estado.
+
+        :param agent_id: ID del agente.
+        :param agent: El agente (HumanAgent, CompactHumanAgent o AgentView).
+        """
+        state = agent.state
+        self.alive[agent_id] = state is not State.DECEASED
+        if state is State.DECEASED and agent_id not in self.deceased:
+            self._pending_deceased.append(agent_id)
+
+        for members, member in (
+            (self.infected, state is State.INFECTED),
+            (self.contagious, state is State.INFECTED and bool(agent.contagious)),
+            (self.recovered, state is State.RECOVERED),
+            (self.deceased, state is State.DECEASED),
+        ):
+            if member:
+                members.add(agent_id)
+            else:
+                members.discard(agent_id)
+
+    def update_many(self, agents):
+        """
+        Actualiza varios agentes, por ejemplo los nuevos infectados que devuelve propagate.
+
+        :param agents: Iterable de agentes.
+        """
+        for agent in agents:
+            self.update(agent.agent_id, agent)
+
+    def pending_deceased(self):
+        return len(self._pending_deceased)
+
+    def pop_deceased(self):
+        """
+        IDs de los fallecidos desde la última llamada, para quitarlos de los clusters en un lote.
+        """
+        deceased, self._pending_deceased = self._pending_deceased, []
+        return np.array(deceased, dtype=np.int64)
+
+    def infected_ids(self):
+        """
+        IDs de los infectados en orden, para avanzar la infección siempre en el mismo orden.
+        """
+        return sorted(self.infected)
+
+    def contagious_ids(self):
+        """
+        IDs ordenados de los agentes contagiosos, para ClusterWithSubclusters.contagious_contacts.
+        """
+        return np.array(sorted(self.contagious), dtype=np.int64)
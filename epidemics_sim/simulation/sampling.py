@@ -0,0 +1,100 @@
+import random
+import numpy as np
+
+
+class AliasTable:
+    def __init__(self, outcomes, weights):
+        """
+        Distribución categórica compilada como tabla de alias (método de Walker/Vose).
+
+        Construirla cuesta O(k) una sola vez; cada muestra cuesta O(1) sin importar
+        cuántas categorías haya: se elige una columna al azar y se devuelve su categoría
+        o su alias según la probabilidad guardada en la columna.
+
+        :param outcomes: Categorías posibles. Pueden ser tuplas para distribuciones conjuntas
+                         (por ejemplo (rango de edad, sexo, ocupación)).
+        :param weights: Pesos o probabilidades de cada categoría (no hace falta normalizarlos).
+        """
+        self.outcomes = tuple(outcomes)
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(self.outcomes) != len(weights) or len(weights) == 0:
+            raise ValueError("AliasTable needs one weight per outcome")
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("AliasTable weights must be non-negative and not all zero")
+
+        size = len(weights)
+        scaled = weights * size / weights.sum()
+        probability = np.ones(size)
+        alias = np.arange(size)
+        small = [i for i in range(size) if scaled[i] < 1.0]
+        large = [i for i in range(size) if scaled[i] >= 1.0]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            probability[low] = scaled[low]
+            alias[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            (small if scaled[high] < 1.0 else large).append(high)
+
+        self.size = size
+        self.probability = probability
+        self.alias = alias
+        # Copias como listas para las muestras individuales, más rápidas que indexar arreglos
+        self._probability = probability.tolist()
+        self._alias = alias.tolist()
+
+    @classmethod
+    def from_dict(cls, distribution):
+        """
+        Compila un diccionario categoría -> peso (los pesos pueden ser cadenas numéricas).
+        """
+        return cls(list(distribution), [float(weight) for weight in distribution.values()])
+
+    def sample_index(self, rng=random):
+        """
+        Índice de una categoría, usando un único número aleatorio de ``rng.random()``.
+        """
+        u = rng.random() * self.size
+        column = int(u)
+        return column if u - column < self._probability[column] else self._alias[column]
+
+    def sample(self, rng=random):
+        """
+        Una categoría sorteada en O(1).
+        """
+        return self.outcomes[self.sample_index(rng)]
+
+    def sample_indices(self, size, rng):
+        """
+        Índices de ``size`` categorías sorteadas en bloque.
+
+        :param size: Cantidad de muestras.
+        :param rng: numpy.random.Generator.
+        :return: Arreglo de índices en outcomes.
+        """
+        u = rng.random(size) * self.size
+        column = u.astype(np.int64)
+        return np.where(u - column < self.probability[column], column, self.alias[column])
+
+
+class BernoulliRates:
+    def __init__(self, rates_per_thousand):
+        """
+        Tasas independientes (por ejemplo las comorbilidades) convertidas una sola vez a probabilidades.
+
+        :param rates_per_thousand: Diccionario nombre -> tasa por mil (número o cadena).
+        """
+        self.names = list(rates_per_thousand)
+        self.probabilities = np.array([float(rate) for rate in rates_per_thousand.values()]) / 1000
+        self._pairs = list(zip(self.names, self.probabilities.tolist()))
+
+    def sample(self, rng=random):
+        """
+        Diccionario nombre -> bool para un agente.
+        """
+        return {name: rng.random() < probability for name, probability in self._pairs}
+
+    def sample_array(self, size, rng):
+        """
+        Matriz booleana (size, número de tasas) sorteada en bloque con un numpy.random.Generator.
+        """
+        return rng.random((size, len(self.probabilities))) < self.probabilities
@@ -8,9 +8,13 @@ from epidemics_sim.policies.mask_policy import MaskUsagePolicy
 from epidemics_sim.simulation.synthetic_population import SyntheticPopulationGenerator #TODO: Cambiar esto a intethic
 from epidemics_sim.simulation.transport_interaction import TransportInteraction
 from epidemics_sim.healthcare.healthcare_system import HealthcareSystem
+from epidemics_sim.simulation.artifact_cache import ArtifactCache
+from epidemics_sim.simulation.snapshot import save_snapshot, save_clusters, load_snapshot, load_clusters
+import random
 
 class SimulationController:
-    def __init__(self, demographics, disease, policies_config, simulation_days, initial_infected):
+    def __init__(self, demographics, disease, policies_config, simulation_days, initial_infected, seed=None, cache=None,
+                 scale=1):
         """
         Initialize the simulation controller.
 
@@ -19,16 +23,28 @@ class SimulationController:
         :param disease_model_class: Class of the disease model to use.
         :param policies: List of policy classes to apply.
         :param simulation_days: Number of days to simulate.
+        :param seed: Seed for population and cluster generation (required to use the cache).
+        :param cache: ArtifactCache (or a cache directory) to reuse populations and clusters
+                      built for the same demographics and seed.
+        :param scale: Simulate a 1:scale sample of the population; reports are scaled back
+                      to full-population numbers through the agent weights.
         """
         self.demographics = demographics
         self.disease_model = disease
         self.policies_config = policies_config 
         self.simulation_days = simulation_days
         self.initial_infected = initial_infected
-        self.agents = self._generate_agents()
-        self.cluster_generator = CityClusterGenerator(demographics)
+        self.seed = seed
+        self.scale = scale
+        self.cache = ArtifactCache(cache) if isinstance(cache, str) else cache
+        self.cluster_generator = CityClusterGenerator(demographics, scale)
+        self.clusters = None
+        if self.cache is not None and self.seed is not None:
+            self.agents, self.clusters = self._load_or_build_cached()
+        else:
+            self.agents = self._generate_agents()
         self.policies = self._configurate_policies(policies_config)
-        self.heathcare_system = HealthcareSystem(5000, 10000, self.policies, self.demographics["municipios"])
+        self.heathcare_system = HealthcareSystem(5000, 10000, self.policies, self.demographics["municipios"], scale)
         
     def _configurate_policies(self, policies_config):
         """
@@ -66,20 +82,52 @@ class SimulationController:
         """
         Generate a synthetic population based on demographic data.
 
-        :return: List of generated agents.
+        :return: AgentStore backed by the memory-mapped population snapshot.
         """
 
         generator = SyntheticPopulationGenerator(
-            demographics=self.demographics
+            demographics=self.demographics, batch=True, seed=self.seed, record_history=False, scale=self.scale
         )
-        agents = generator.generate_population()
+        agents = generator.generate_store()
         print("se genero la poblacion")
-        generator.save_population(agents,'population.pkl')
+        generator.save_population(agents, 'population')
         print("Se salvo")
-        agents = generator.load_population('population.pkl')
+        agents = generator.load_population('population')
         print("Se cargo")
         return agents
 
+    def _load_or_build_cached(self):
+        """
+        Load the population and its clusters from the artifact cache, building and
+        storing them first if this demographics/seed combination is not cached.
+
+        :return: Tuple (agents, clusters).
+        """
+        key = self.cache.key(self.demographics, self.seed, scale=self.scale)
+        path = self.cache.get(key)
+        if path is None:
+            random.seed(self.seed)  # La generacion de clusters usa el modulo random
+            generator = SyntheticPopulationGenerator(
+                demographics=self.demographics, batch=True, seed=self.seed, record_history=False, scale=self.scale
+            )
+            agents = generator.generate_store()
+            clusters = self.cluster_generator.generate_clusters(agents.values())
+
+            def write(directory):
+                save_snapshot(agents, directory)
+                save_clusters(clusters, directory)
+
+            path = self.cache.put(key, write)
+            print(f"Población y clusters guardados en la caché ({key[:12]})")
+        else:
+            print(f"Población y clusters cargados de la caché ({key[:12]})")
+
+        agents = load_snapshot(path)
+        clusters = load_clusters(path, agents)
+        # Con o sin acierto en la caché, la simulación arranca desde el mismo estado de random
+        random.seed(self.seed)
+        return agents, clusters
+
     def run(self):
         """
         Run the simulation.
@@ -94,7 +142,8 @@ class SimulationController:
             disease_model=self.disease_model,
             policies=self.policies,
             healthcare_system=self.heathcare_system,
-            initial_infected= self.initial_infected
+            initial_infected= self.initial_infected,
+            clusters=self.clusters
         )
 
         # Run simulation for the specified number of days
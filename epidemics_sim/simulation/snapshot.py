@@ -0,0 +1,286 @@
+import bisect
+import json
+import os
+import numpy as np
+from epidemics_sim.agents.agent_store import AgentStore, COLUMNS
+from epidemics_sim.simulation.clusters import ClusterWithSubclusters, Subcluster
+
+# Formato en disco de una población:
+#   <ruta>/manifest.json              metadatos (tamaño, municipios, columnas, membresías)
+#   <ruta>/<columna>.npy              una columna de AgentStore por archivo
+#   <ruta>/<grupo>_offsets.npy        membresías (hogares, clusters) como offsets + índices
+#   <ruta>/<grupo>_members.npy
+#   <ruta>/clusters.json              tipos de cluster guardados con save_clusters
+#   <ruta>/<tipo>_edge_offsets.npy    aristas de cada subcluster (pares de IDs de agentes)
+#   <ruta>/<tipo>_edges.npy
+#
+# Una población en shards es un directorio con shards.json y un snapshot por shard.
+SNAPSHOT_FORMAT = "epidemics_sim.population"
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+CLUSTERS_MANIFEST = "clusters.json"
+SHARDS_MANIFEST = "shards.json"
+SHARDS_FORMAT = "epidemics_sim.shards"
+
+
+def save_snapshot(store, path, memberships=None):
+    """
+    Guarda una población en formato columnar, un archivo .npy por columna.
+
+    :param store: AgentStore a guardar.
+    :param path: Directorio de destino (se crea si no existe).
+    :param memberships: Diccionario opcional nombre -> (offsets, members), por ejemplo
+                        los hogares o los subclusters de cada tipo de cluster.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        os.remove(os.path.join(path, MANIFEST))
+    memberships = dict(memberships or {})
+    memberships.setdefault("households", store.households())
+
+    for name in list(COLUMNS) + ["comorbidities"]:
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(store, name)))
+
+    for name, (offsets, members) in memberships.items():
+        np.save(os.path.join(path, f"{name}_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        np.save(os.path.join(path, f"{name}_members.npy"), np.asarray(members, dtype=np.int32))
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "size": store.size,
+        "first_id": store.first_id,
+        "municipios": store.municipios,
+        "comorbidity_names": store.comorbidity_names,
+        "diseases": store.diseases,
+        "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+        "memberships": sorted(memberships),
+    }
+    # El manifiesto se escribe al final: un directorio sin manifiesto es un snapshot incompleto
+    with open(os.path.join(path, MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported population snapshot in {path}")
+    return manifest
+
+
+def load_snapshot(path, mmap_mode="c", record_history=False):
+    """
+    Abre una población guardada con save_snapshot sin copiarla a memoria.
+
+    Las columnas se abren con np.load(mmap_mode=...), así que el costo no depende del
+    tamaño de la población. Con "r" o "c" varios procesos que abren el mismo snapshot
+    comparten las páginas del archivo a través del page cache; con "c" (copy-on-write)
+    cada proceso puede modificar su copia sin tocar el archivo.
+
+    :param path: Directorio del snapshot.
+    :param mmap_mode: Modo de np.load ("r", "c", "r+" o None para cargar en memoria).
+    :param record_history: Guardar el historial de transiciones en el AgentStore.
+    :return: AgentStore respaldado por las columnas del snapshot.
+    """
+    manifest = read_manifest(path)
+    columns = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in list(COLUMNS) + ["comorbidities"]
+    }
+    store = AgentStore(
+        manifest["size"], manifest["municipios"], manifest["comorbidity_names"], record_history, columns=columns,
+        first_id=manifest.get("first_id", 0)
+    )
+    store.diseases = list(manifest["diseases"])
+    if "households" in manifest["memberships"]:
+        store._households = load_membership(path, "households", mmap_mode)
+    return store
+
+
+def load_membership(path, name, mmap_mode="c"):
+    """
+    Lee un grupo de membresía (offsets, members) de un snapshot.
+    """
+    offsets = np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode=mmap_mode)
+    members = np.load(os.path.join(path, f"{name}_members.npy"), mmap_mode=mmap_mode)
+    return offsets, members
+
+
+def cluster_memberships(clusters):
+    """
+    Convierte los subclusters de cada tipo de cluster en arreglos (offsets, members).
+
+    :param clusters: Diccionario tipo -> ClusterWithSubclusters.
+    :return: Diccionario tipo -> (offsets, members).
+    """
+    return {cluster_type: cluster.memberships() for cluster_type, cluster in clusters.items()}
+
+
+def save_clusters(clusters, path):
+    """
+    Guarda la estructura de contactos: subclusters de cada tipo y sus aristas.
+
+    :param clusters: Diccionario tipo -> ClusterWithSubclusters.
+    :param path: Directorio del snapshot.
+    """
+    os.makedirs(path, exist_ok=True)
+    metadata = {}
+    for cluster_type, (offsets, members) in cluster_memberships(clusters).items():
+        cluster = clusters[cluster_type]
+        np.save(os.path.join(path, f"{cluster_type}_offsets.npy"), offsets)
+        np.save(os.path.join(path, f"{cluster_type}_members.npy"), np.asarray(members, dtype=np.int32))
+        np.save(os.path.join(path, f"{cluster_type}_edge_offsets.npy"), cluster.edge_offsets)
+        np.save(os.path.join(path, f"{cluster_type}_edges.npy"), np.column_stack((cluster.sources, cluster.targets)))
+        metadata[cluster_type] = {
+            "active_periods": cluster.active_periods,
+            "interaction_probability": cluster.interaction_probability,
+            "topology": cluster.subclusters[0].topology if cluster.subclusters else None,
+        }
+
+    with open(os.path.join(path, CLUSTERS_MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=2)
+
+
+def load_clusters(path, agents):
+    """
+    Reconstruye los clusters guardados con save_clusters sin volver a generar los grafos.
+
+    :param path: Directorio del snapshot.
+    :param agents: Población (AgentStore o diccionario de agentes) a la que pertenecen.
+    :return: Diccionario tipo -> ClusterWithSubclusters.
+    """
+    with open(os.path.join(path, CLUSTERS_MANIFEST), encoding="utf-8") as file:
+        metadata = json.load(file)
+
+    clusters = {}
+    for cluster_type, info in metadata.items():
+        cluster = ClusterWithSubclusters([], cluster_type, info["active_periods"], info["interaction_probability"])
+        offsets, members = load_membership(path, cluster_type, None)
+        edge_offsets = np.load(os.path.join(path, f"{cluster_type}_edge_offsets.npy"))
+        edges = np.load(os.path.join(path, f"{cluster_type}_edges.npy"))
+        for i in range(len(offsets) - 1):
+            subcluster_agents = [agents[agent_id] for agent_id in members[offsets[i]:offsets[i + 1]].tolist()]
+            cluster.subclusters.append(Subcluster(subcluster_agents, cluster, info["topology"], edges=()))
+        cluster.set_edges(edge_offsets, edges[:, 0], edges[:, 1])
+        clusters[cluster_type] = cluster
+    return clusters
+
+
+def write_shard_manifest(directory, shards, municipios, comorbidity_names):
+    """
+    Escribe shards.json para los shards ya guardados en ``directory``.
+
+    :param shards: Lista de {"path", "municipio", "first_id", "size"} ordenada por first_id.
+    """
+    manifest = {
+        "format": SHARDS_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "size": sum(shard["size"] for shard in shards),
+        "municipios": municipios,
+        "comorbidity_names": comorbidity_names,
+        "shards": shards,
+    }
+    with open(os.path.join(directory, SHARDS_MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+
+
+class ShardedPopulation:
+    def __init__(self, directory, mmap_mode="c"):
+        """
+        Población repartida en shards que se abren (con np.memmap) solo cuando se usan.
+
+        Se comporta como el diccionario de agentes: ``population[agent_id]``, ``keys()``,
+        ``values()`` e ``items()`` recorren los shards en orden sin cargarlos en memoria.
+
+        :param directory: Directorio escrito por SyntheticPopulationGenerator.generate_shards.
+        :param mmap_mode: Modo de np.load para las columnas de cada shard.
+        """
+        with open(os.path.join(directory, SHARDS_MANIFEST), encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("format") != SHARDS_FORMAT:
+            raise ValueError(f"Unsupported sharded population in {directory}")
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        self.size = manifest["size"]
+        self.municipios = manifest["municipios"]
+        self.comorbidity_names = manifest["comorbidity_names"]
+        self.shard_info = manifest["shards"]
+        self._first_ids = [shard["first_id"] for shard in self.shard_info]
+        self._stores = {}
+
+    def shard(self, index):
+        """
+        AgentStore del shard ``index``; se abre en el primer acceso.
+        """
+        if index not in self._stores:
+            path = os.path.join(self.directory, self.shard_info[index]["path"])
+            self._stores[index] = load_snapshot(path, self.mmap_mode)
+        return self._stores[index]
+
+    def shards(self, municipio=None):
+        """
+        Recorre los shards en orden, opcionalmente solo los de un municipio.
+        """
+        for index, info in enumerate(self.shard_info):
+            if municipio is None or info["municipio"] == municipio:
+                yield self.shard(index)
+
+    def release(self, index=None):
+        """
+        Cierra los shards abiertos (o solo uno) para liberar sus mapeos.
+        """
+        if index is None:
+            self._stores.clear()
+        else:
+            self._stores.pop(index, None)
+
+    def _locate(self, agent_id):
+        index = bisect.bisect_right(self._first_ids, agent_id) - 1
+        if index < 0 or agent_id >= self._first_ids[index] + self.shard_info[index]["size"]:
+            raise KeyError(agent_id)
+        return index
+
+    def count(self, state):
+        return sum(store.count(state) for store in self.shards())
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, agent_id):
+        return self.shard(self._locate(agent_id))[agent_id]
+
+    def __contains__(self, agent_id):
+        try:
+            self._locate(agent_id)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return (agent_id for store in self.shards() for agent_id in store.keys())
+
+    def values(self):
+        return _ShardedValues(self)
+
+    def items(self):
+        return ((agent.agent_id, agent) for agent in self.values())
+
+
+class _ShardedValues:
+    """
+    Secuencia re-iterable de AgentView sobre todos los shards.
+    """
+    __slots__ = ("_population",)
+
+    def __init__(self, population):
+        self._population = population
+
+    def __len__(self):
+        return len(self._population)
+
+    def __iter__(self):
+        return (agent for store in self._population.shards() for agent in store.values())
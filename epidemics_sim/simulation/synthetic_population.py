@@ -1,6 +1,11 @@
-import pickle  # Para serialización y deserialización
-from epidemics_sim.agents.human_agent import HumanAgent
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.simulation.snapshot import save_snapshot, load_snapshot, write_shard_manifest, ShardedPopulation
+from epidemics_sim.simulation.sampling import AliasTable, BernoulliRates
+from epidemics_sim.agents.human_agent import HumanAgent, CompactHumanAgent, GENDERS, OCCUPATIONS, base_mortality_rates
+import os
 import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 # def get_large_household_size():
 #     distribution = {5: 0.5, 6: 0.3, 7: 0.15, 8: 0.05}
@@ -14,32 +19,261 @@ import random
 #     "5_personas_o_mas": get_large_household_size
 # }
 
+# Rangos de edad de "Habitantes_por_edad" -> (edad minima, edad maxima) inclusive
+AGE_BANDS = {
+    "0-15": (0, 15),
+    "16-59": (16, 59),
+    "60 y +": (60, 100),
+}
+
+def _generate_municipio(task):
+    """
+    Genera las columnas de un municipio; es la tarea que ejecuta cada proceso del pool.
+
+    :param task: Tupla (tasas de comorbilidades, datos del municipio, SeedSequence, escala).
+    """
+    comorbidities_rates, data, seed, scale = task
+    generator = SyntheticPopulationGenerator({"Comorbilidades": comorbidities_rates, "municipios": {}}, scale=scale)
+    return generator._generate_municipio_arrays(data, np.random.default_rng(seed))
+
+
 class SyntheticPopulationGenerator:
-    def __init__(self, demographics):
+    def __init__(self, demographics, batch=False, seed=None, compact=False, record_history=True, workers=None,
+                 scale=1):
         """
         Clase para generar una población sintética basada en los datos demográficos.
         
         :param demographics: Diccionario con datos demográficos.
+        :param batch: Si es True, los atributos se sortean por municipio como arreglos de NumPy.
+        :param seed: Semilla maestra del modo batch; cada municipio usa una semilla hija
+                     derivada con numpy.random.SeedSequence.
+        :param compact: Si es True, se crean CompactHumanAgent en lugar de HumanAgent.
+        :param record_history: Si es False, los agentes no guardan el historial de transiciones.
+        :param workers: Número de procesos para generar los municipios en paralelo (None o 1 = secuencial).
+        :param scale: Genera una muestra 1:scale de la población. Cada agente lleva en ``weight``
+                      el número de personas reales que representa (1 con la población completa).
         """
         self.demographics = demographics
         self.comorbidities_rates = demographics.get("Comorbilidades", {})  # Tasa de comorbilidades por mil
+        self.comorbidity_sampler = BernoulliRates(self.comorbidities_rates)
         self.population = {}
         self.agent_counter = 0 # Contador de agentes
+        self.batch = batch
+        self.seed_entropy = np.random.SeedSequence(seed).entropy
+        self.workers = workers
+        self.agent_class = CompactHumanAgent if compact else HumanAgent
+        self.record_history = record_history
+        self.scale = scale
+
     def generate_population(self):
         """
         Genera una población de agentes con atributos demográficos.
         """
-        self._generate_agents()
+        if self.batch:
+            self._agents_from_arrays(self.generate_population_arrays())
+        else:
+            self._generate_agents()
         return self.population
 
-    def save_population(self, agents, filepath):
-        with open(filepath, 'wb') as file:
-            pickle.dump(agents, file)
+    def generate_population_arrays(self):
+        """
+        Genera la población completa como columnas de NumPy, sin crear objetos HumanAgent.
+
+        Los agentes quedan en el mismo orden que en el modo secuencial: por municipio,
+        primero los varones y luego las hembras, con IDs contiguos por municipio.
+        Cada municipio se sortea con su propia semilla hija, así que el resultado es
+        idéntico bit a bit sin importar cuántos procesos se usen.
+
+        :return: Diccionario de columnas (agent_id, age, gender, occupation, municipio,
+                 comorbidities, mortality_rate, weight) indexadas por posicion, más
+                 municipio_offsets: los agentes del municipio i van de offsets[i] a offsets[i + 1].
+        """
+        municipios = list(self.demographics["municipios"].keys())
+        seeds = self.municipio_seeds()
+        tasks = [
+            (self.comorbidities_rates, self.demographics["municipios"][municipio], seed, self.scale)
+            for municipio, seed in zip(municipios, seeds)
+        ]
+        if self.workers and self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                chunks = list(pool.map(_generate_municipio, tasks))
+        else:
+            chunks = [_generate_municipio(task) for task in tasks]
+
+        for code, columns in enumerate(chunks):
+            columns["municipio"] = np.full(len(columns["age"]), code, dtype=np.int16)
+
+        columns = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]} if chunks else {}
+        num_agents = len(columns["age"]) if chunks else 0
+        columns["agent_id"] = np.arange(self.agent_counter, self.agent_counter + num_agents, dtype=np.int64)
+        columns["municipio_offsets"] = self.agent_counter + np.concatenate(
+            ([0], np.cumsum([len(chunk["age"]) for chunk in chunks], dtype=np.int64))
+        )
+        self.agent_counter += num_agents
+        columns["municipios"] = municipios
+        columns["comorbidity_names"] = list(self.comorbidities_rates.keys())
+        return columns
+
+    def sample_counts(self, data):
+        """
+        Número de varones y hembras a generar en un municipio y el peso de cada uno.
+
+        Con ``scale`` > 1 se sortea round(n / scale) habitantes de cada sexo, así que las
+        proporciones entre municipios y sexos se conservan; el peso es n / muestra, de modo
+        que la suma de los pesos reproduce exactamente la población del municipio.
+
+        :param data: Datos demográficos del municipio.
+        :return: Tupla (varones, hembras, peso de los varones, peso de las hembras).
+        """
+        counts = [int(data["population"].get(key, 0)) for key in ("VARONES", "HEMBRAS")]
+        samples = [int(round(count / self.scale)) for count in counts]
+        weights = [count / sample if sample else 0.0 for count, sample in zip(counts, samples)]
+        return samples[0], samples[1], weights[0], weights[1]
+
+    def age_table(self, data):
+        """
+        Tabla de alias de los rangos de edad (``Habitantes_por_edad``) de un municipio.
+        Se compila una vez por municipio y luego cada edad se sortea en O(1).
+        """
+        return AliasTable.from_dict(data["population"]["Habitantes_por_edad"])
+
+    def municipio_seeds(self):
+        """
+        Semillas hijas (una por municipio, en orden) derivadas de la semilla maestra.
+        """
+        return np.random.SeedSequence(self.seed_entropy).spawn(len(self.demographics["municipios"]))
+
+    def generate_shards(self, directory, chunk_size=1_000_000):
+        """
+        Genera la población por partes y la escribe en disco sin tenerla completa en memoria.
+
+        Cada shard es un snapshot (ver simulation/snapshot.py) con a lo sumo ``chunk_size``
+        agentes de un único municipio, y ``shards.json`` describe el rango de IDs de cada uno.
+        La memoria máxima depende de ``chunk_size`` y no del tamaño de la población.
+        Si un municipio cabe en un solo shard se sortea con la misma semilla que en
+        generate_population_arrays, así que ambos modos coinciden.
+
+        :param directory: Directorio de destino.
+        :param chunk_size: Número máximo de agentes por shard.
+        :return: ShardedPopulation que abre los shards bajo demanda.
+        """
+        os.makedirs(directory, exist_ok=True)
+        municipios = list(self.demographics["municipios"].keys())
+        shards = []
+        for code, (municipio, seed) in enumerate(zip(municipios, self.municipio_seeds())):
+            data = self.demographics["municipios"][municipio]
+            num_male, num_female, _, _ = self.sample_counts(data)
+            total = num_male + num_female
+            num_chunks = -(-total // chunk_size)
+            chunk_seeds = [seed] if num_chunks == 1 else seed.spawn(num_chunks)
+
+            for chunk, chunk_seed in enumerate(chunk_seeds):
+                start, stop = chunk * chunk_size, min(total, (chunk + 1) * chunk_size)
+                columns = self._generate_municipio_arrays(data, np.random.default_rng(chunk_seed), start, stop)
+                columns["municipio"] = np.full(stop - start, code, dtype=np.int16)
+                columns["agent_id"] = np.arange(self.agent_counter, self.agent_counter + stop - start, dtype=np.int64)
+                columns["municipios"] = municipios
+                columns["comorbidity_names"] = list(self.comorbidities_rates.keys())
+
+                name = f"shard_{len(shards):05d}"
+                save_snapshot(AgentStore.from_arrays(columns), os.path.join(directory, name))
+                shards.append({"path": name, "municipio": municipio, "first_id": self.agent_counter, "size": stop - start})
+                self.agent_counter += stop - start
+
+        write_shard_manifest(directory, shards, municipios, list(self.comorbidities_rates.keys()))
+        print(f"Población escrita en {len(shards)} shards en {directory}.")
+        return ShardedPopulation(directory)
+
+    def _generate_municipio_arrays(self, data, rng, start=0, stop=None):
+        """
+        Sortea en bloque edad, sexo, ocupación y comorbilidades de todos los habitantes de un municipio.
+
+        :param data: Datos demográficos del municipio.
+        :param rng: numpy.random.Generator a usar.
+        :param start: Primer habitante a generar (para generar el municipio por partes).
+        :param stop: Habitante final, exclusivo (None = hasta el final del municipio).
+        :return: Diccionario de columnas del municipio.
+        """
+        num_male, num_female, male_weight, female_weight = self.sample_counts(data)
+        stop = num_male + num_female if stop is None else stop
+        num_agents = stop - start
+
+        # Los varones ocupan las primeras posiciones del municipio
+        males_in_range = min(max(num_male - start, 0), num_agents)
+        gender = np.repeat(np.arange(len(GENDERS), dtype=np.int8), [males_in_range, num_agents - males_in_range])
+        age = self._generate_age_array(self.age_table(data), num_agents, rng)
+        occupation = self._generate_occupation_array(age, rng)
+        comorbidities = self.comorbidity_sampler.sample_array(num_agents, rng)
+
+        # HumanAgent cuenta todas las entradas del diccionario de comorbilidades (len),
+        # asi que se replica ese conteo para que ambos modos den la misma tasa.
+        mortality_rate = base_mortality_rates(age, len(self.comorbidity_sampler.names))
+
+        return {
+            "age": age,
+            "gender": gender,
+            "occupation": occupation,
+            "comorbidities": comorbidities,
+            "mortality_rate": mortality_rate,
+            "weight": np.where(gender == 0, male_weight, female_weight).astype(np.float32),
+        }
+
+    def _generate_age_array(self, age_table, size, rng):
+        bands = age_table.sample_indices(size, rng)
+        low = np.array([AGE_BANDS[r][0] for r in age_table.outcomes])
+        high = np.array([AGE_BANDS[r][1] for r in age_table.outcomes])
+        return rng.integers(low[bands], high[bands] + 1).astype(np.uint8)
+
+    def _generate_occupation_array(self, ages, rng):
+        occupation = np.full(len(ages), OCCUPATIONS.index("worker"), dtype=np.int8)
+        occupation[ages < 18] = OCCUPATIONS.index("student")
+        young = (ages >= 18) & (ages <= 22)
+        occupation[young & (rng.random(len(ages)) >= 0.5)] = OCCUPATIONS.index("student") # 50 % de probabilidad
+        occupation[ages >= 65] = OCCUPATIONS.index("retired")
+        return occupation
+
+    def _agents_from_arrays(self, columns):
+        """
+        Construye los HumanAgent a partir de las columnas generadas en bloque.
+        """
+        municipios = columns["municipios"]
+        names = columns["comorbidity_names"]
+        for agent_id, age, gender, occupation, municipio, flags, mortality_rate, weight in zip(
+            columns["agent_id"].tolist(), columns["age"].tolist(), columns["gender"].tolist(),
+            columns["occupation"].tolist(), columns["municipio"].tolist(),
+            columns["comorbidities"].tolist(), columns["mortality_rate"].tolist(), columns["weight"].tolist()
+        ):
+            comorbidities = dict(zip(names, flags))
+            self.population[agent_id] = self.agent_class(
+                agent_id, age, GENDERS[gender], OCCUPATIONS[occupation], None, municipios[municipio], None,
+                comorbidities, mortality_rate=mortality_rate, record_history=self.record_history, weight=weight
+            )
+
+    def generate_store(self):
+        """
+        Genera la población en modo batch directamente como AgentStore.
+        """
+        return AgentStore.from_arrays(self.generate_population_arrays(), self.record_history)
+
+    def save_population(self, agents, filepath, memberships=None):
+        """
+        Guarda la población como snapshot columnar (ver simulation/snapshot.py).
+
+        :param agents: AgentStore o diccionario de HumanAgent.
+        :param filepath: Directorio del snapshot.
+        :param memberships: Membresías adicionales nombre -> (offsets, members).
+        """
+        store = agents if isinstance(agents, AgentStore) else AgentStore.from_agents(agents, self.record_history)
+        save_snapshot(store, filepath, memberships)
         print(f"Población guardada en {filepath}.")
 
-    def load_population(self, filepath):
-        with open(filepath, 'rb') as file:
-            agents = pickle.load(file)
+    def load_population(self, filepath, mmap_mode="c"):
+        """
+        Abre un snapshot con np.memmap; varios procesos pueden compartir el mismo archivo.
+
+        :return: AgentStore respaldado por el snapshot.
+        """
+        agents = load_snapshot(filepath, mmap_mode, self.record_history)
         print(f"Población cargada desde {filepath}.")
         return agents
 
@@ -49,19 +283,19 @@ class SyntheticPopulationGenerator:
             # if "population" not in data:
             #     continue  # Ignorar claves generales como "Comorbilidades"
 
-            num_male = int(data["population"].get("VARONES", 0))
-            num_female = int(data["population"].get("HEMBRAS", 0))
+            num_male, num_female, male_weight, female_weight = self.sample_counts(data)
 
-            self._create_agents(num_male, "male", municipio, data)
-            self._create_agents(num_female, "female", municipio, data)
+            self._create_agents(num_male, "male", municipio, data, male_weight)
+            self._create_agents(num_female, "female", municipio, data, female_weight)
         
         #return agents
 
-    def _create_agents(self, num_agents, gender, municipio, data):
+    def _create_agents(self, num_agents, gender, municipio, data, weight=1.0):
         #agents = []
         #agents = {}
+        age_table = self.age_table(data)
         for _ in range(num_agents):
-            age = self._generate_age(data["population"]["Habitantes_por_edad"])
+            age = self._generate_age(age_table)
             occupation = self._generate_occupation(age)
             comorbidities = self._generate_comorbidities()
             
@@ -69,24 +303,17 @@ class SyntheticPopulationGenerator:
             agent_id = self.agent_counter
             self.agent_counter += 1
             
-            agent = HumanAgent(
-                agent_id, age, gender, occupation, None, municipio, None, comorbidities
+            agent = self.agent_class(
+                agent_id, age, gender, occupation, None, municipio, None, comorbidities,
+                record_history=self.record_history, weight=weight
             )
             self.population[agent_id] = agent
         #return agents
 
     
-    def _generate_age(self, age_distribution):
-        ranges = list(age_distribution.keys())
-        probabilities = [float(age_distribution[r]) for r in ranges]
-        chosen_range = random.choices(ranges, probabilities)[0]
-
-        if chosen_range == "0-15":
-            return random.randint(0, 15)
-        elif chosen_range == "16-59":
-            return random.randint(16, 59)
-        elif chosen_range == "60 y +":
-            return random.randint(60, 100)
+    def _generate_age(self, age_table):
+        low, high = AGE_BANDS[age_table.sample()]
+        return random.randint(low, high)
 
     def _generate_occupation(self, age):
         if age < 18:
@@ -102,8 +329,5 @@ class SyntheticPopulationGenerator:
             return "retired"
 
     def _generate_comorbidities(self):
-        comorbidities = {}
-        for disease, rate_per_thousand in self.comorbidities_rates.items():
-            probability = float(rate_per_thousand) / 1000  # Convertimos tasa por mil a probabilidad 0-1
-            comorbidities[disease] = random.random() < probability
-        return comorbidities
+        # Las tasas por mil se convierten a probabilidades una sola vez (BernoulliRates)
+        return self.comorbidity_sampler.sample()
@@ -0,0 +1,102 @@
+import argparse
+import copy
+import json
+import random
+import numpy as np
+from epidemics_sim.agents.agent_store import AgentStore
+from epidemics_sim.diseases.covid_model import CovidModel
+from epidemics_sim.simulation.clusters import CityClusterGenerator
+from epidemics_sim.simulation.dailysim import CLUSTER_PERIODS
+from epidemics_sim.simulation.synthetic_population import SyntheticPopulationGenerator
+
+# Comprueba que DiseaseModel.propagate_arrays reproduce el lazo de referencia propagate sobre
+# los contactos de un día de una población sembrada:
+#   python -m epidemics_sim.simulation.transmission_check
+
+
+def day_contacts(agents, clusters):
+    """
+    Contactos de un día por tipo de cluster, como listas de pares (entrada de propagate).
+    """
+    return {
+        cluster_type: clusters[cluster_type].simulate_interactions(period, agents)
+        for cluster_type, period in CLUSTER_PERIODS.items()
+    }
+
+
+def as_arrays(contacts):
+    return {
+        layer: (np.array([a for a, _ in pairs], dtype=np.int64), np.array([b for _, b in pairs], dtype=np.int64))
+        for layer, pairs in contacts.items()
+    }
+
+
+def build(demographics_path, disease_path, municipios, scale, seed, initial_infected):
+    with open(demographics_path, encoding="utf-8") as file:
+        demographics = json.load(file)
+    demographics["municipios"] = dict(list(demographics["municipios"].items())[:municipios])
+    with open(disease_path, encoding="utf-8") as file:
+        disease = json.load(file)
+
+    random.seed(seed)
+    generator = SyntheticPopulationGenerator(demographics, batch=True, seed=seed, record_history=False, scale=scale)
+    agents = AgentStore.from_arrays(generator.generate_population_arrays())
+    clusters = CityClusterGenerator(demographics, scale=scale).generate_clusters(agents.values())
+    model = CovidModel.from_config({key: value for key, value in disease.items() if key != "compartments"})
+    model.initialize_infections([agents[agent_id] for agent_id in random.sample(list(agents.keys()), initial_infected)])
+    return agents, clusters, model
+
+
+def check(agents, contacts, model, repetitions, seed):
+    """
+    :return: True si ambos caminos coinciden.
+    """
+    arrays = as_arrays(contacts)
+    rate = model.transmission_rate
+
+    # Con probabilidad 1 los dos caminos son deterministas: mismos infectados en el mismo orden
+    model.transmission_rate = 1.0
+    reference, vectorized = copy.deepcopy(agents), copy.deepcopy(agents)
+    expected = [agent.agent_id for agent in model.propagate(contacts, reference).values()]
+    obtained = [agent.agent_id for agent in model.propagate_arrays(arrays, vectorized).values()]
+    exact = expected == obtained
+    print(f"Probabilidad 1: {len(expected)} infectados con propagate, {len(obtained)} con propagate_arrays, "
+          f"{'iguales' if exact else 'DISTINTOS'}")
+    model.transmission_rate = rate
+
+    # Con la tasa real se comparan las medias de nuevos infectados
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    counts = {"propagate": [], "propagate_arrays": []}
+    for _ in range(repetitions):
+        counts["propagate"].append(len(model.propagate(contacts, copy.deepcopy(agents))))
+        counts["propagate_arrays"].append(len(model.propagate_arrays(arrays, copy.deepcopy(agents), rng)))
+    means = {name: np.mean(values) for name, values in counts.items()}
+    error = np.sqrt(sum(np.var(values) / len(values) for values in counts.values()))
+    close = abs(means["propagate"] - means["propagate_arrays"]) <= 4 * error
+    print(f"Tasa {rate}: media de nuevos infectados {means['propagate']:.1f} (propagate) vs "
+          f"{means['propagate_arrays']:.1f} (propagate_arrays), error estándar {error:.2f}")
+    return exact and close
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara propagate_arrays con propagate en una población sembrada.")
+    parser.add_argument("--demographics", default="epidemics_sim/data/habana/json_files/habana.json")
+    parser.add_argument("--disease", default="epidemics_sim/data/covid/covid.json")
+    parser.add_argument("--municipios", type=int, default=1)
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--initial-infected", type=int, default=200)
+    parser.add_argument("--repetitions", type=int, default=200)
+    args = parser.parse_args()
+
+    agents, clusters, model = build(
+        args.demographics, args.disease, args.municipios, args.scale, args.seed, args.initial_infected
+    )
+    ok = check(agents, day_contacts(agents, clusters), model, args.repetitions, args.seed)
+    print("OK" if ok else "FALLÓ")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()